@@ -1,67 +1,208 @@
-import socket
 import asyncio
-import functools
-import inspect
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from periodic import Periodic
 
 IP_ADDRESS = "192.168.103.164"
 PORT = 5025
 
+KEEPALIVE = 10  # s between *IDN? health checks on an idle link
+MAX_BACKOFF = 30  # s, longest wait between reconnect attempts
+LINK_ERRORS = (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError)
 
-def no_socket_handler(func) -> object:
-    @functools.wraps(func)
-    async def wrapper(*args, **kwargs):
-        try:
-            if inspect.iscoroutinefunction(func):
-                res = await func(*args, **kwargs)
-            else:
-                res = func(*args, **kwargs)
-        except socket.error as e:
-            res = f"Failed to connect to {IP_ADDRESS}:{PORT}.".encode("utf-8")
-        finally:
-            if isinstance(res, tuple) or isinstance(res, list):
-                return *res,
-            return res
-    return wrapper
+CHANNELS = {"T0": 0, "T1": 1, "A": 2, "B": 3, "C": 4, "D": 5, "E": 6, "F": 7, "G": 8, "H": 9}
+ESR_ERRORS = 0b00111100  # query, device-dependent, execution and command error bits of *ESR?
 
 
-async def test():
-    reader, writer, resp = await connect(ip=IP_ADDRESS, port=PORT)
-    resp = await send_receive(reader, writer, "DLAY?2\n")
-    await close(writer)
+@dataclass(frozen=True, slots=True)
+class SetResult:
+    """Outcome of ``DG645.set_delays``: whether the delays are in, and the status text."""
 
+    ok: bool
+    message: str
 
 
-@no_socket_handler
-async def connect(ip=IP_ADDRESS, port=PORT) -> None:
-    try:
-        reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout=1)
+def delay_command(channel: str, delay: float, reference: str = "T0") -> str:
+    """DLAY set command for ``channel`` at ``delay`` seconds after ``reference``."""
+    return f"DLAY {CHANNELS[channel]},{CHANNELS[reference]},{delay:.12e}"
 
-        resp = f"Attempting to connect to DG645 at {ip}:{port}\n"
-    except asyncio.TimeoutError:
-        return None, None, f"Connection to DG645 at {ip}:{port} timed out.\n"
 
-    return reader, writer, resp
+async def _readline(reader) -> str:
+    line = await asyncio.wait_for(reader.readline(), timeout=1)
+    if not line:
+        raise ConnectionResetError("DG645 closed the connection")
+    return line.decode("ascii").strip()
 
 
-@no_socket_handler
-async def send_receive(reader, writer, command):
-    if not command.endswith("\n"):
-        command += "\n"
-    writer.write(command.encode("utf-8"))
+async def _query(reader, writer, command: str) -> str:
+    writer.write(f"{command.strip()}\n".encode("utf-8"))
     await writer.drain()
-    resp = await asyncio.wait_for(reader.read(1024), timeout=1)
-    print(resp, resp.decode("ascii"))
-    # return resp.decode("ascii")
-    return ""
+    return await _readline(reader)
+
+
+async def _write_batch(reader, writer, commands) -> str | None:
+    """Send ``commands`` in one message; returns an error description, or None if all went in."""
+    message = ";".join(command.strip() for command in commands) + ";*ESR?"
+    esr = int(await _query(reader, writer, message))
+
+    if esr & ESR_ERRORS:
+        err = await _query(reader, writer, "LERR?")
+        return f"ESR={esr}, LERR={err}"
+    return None
+
+
+class DG645(Periodic):
+    """Long-lived connection to the delay generator.
+
+    ``start`` launches a background task that owns the link: it checks it with
+    ``*IDN?`` every ``keepalive`` seconds and reconnects with exponential
+    backoff when it drops. Everything on the stream goes through one lock, so a
+    health check never lands in the middle of a batch.
+
+    ``delays`` shadows the last ``DLAY`` the instrument confirmed for each
+    channel, so ``set_delays`` only sends the channels that changed. It is
+    forgotten whenever the link is (re)made, as the front panel may have been
+    used in the meantime.
+    """
+
+    def __init__(self, ip=IP_ADDRESS, port=PORT, keepalive=KEEPALIVE, status=None) -> None:
+        self.ip = ip
+        self.port = port
+        self.keepalive = keepalive
+        self.status = status or (lambda resp: None)
+        self.reader = None
+        self.writer = None
+        self.idn = None
+        self.delays = {}  # channel -> DLAY command last confirmed by the instrument
+        self._lock = asyncio.Lock()
+        self._backoff = 1
+        self._reported = None  # last link state reported, so retries don't repeat it
+
+    @property
+    def connected(self) -> bool:
+        return self.writer is not None and not self.writer.is_closing()
+
+    async def connect(self) -> str:
+        self.delays.clear()
+        try:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.ip, self.port), timeout=1,
+            )
+            self.idn = await _query(self.reader, self.writer, "*IDN?")
+        except LINK_ERRORS:
+            self._drop()
+            return f"Connection to DG645 at {self.ip}:{self.port} failed.\n"
+        return f"Connected to DG645 at {self.ip}:{self.port} ({self.idn}).\n"
+
+    def _drop(self) -> None:
+        self.delays.clear()
+        if self.writer is not None:
+            self.writer.close()
+        self.reader, self.writer = None, None
+
+    async def step(self) -> float:
+        """Check the link, reconnecting if it dropped; returns the wait before the next check."""
+        async with self._lock:
+            if self.connected:
+                try:
+                    await _query(self.reader, self.writer, "*IDN?")
+                except LINK_ERRORS:
+                    self._drop()
+            if not self.connected:
+                resp = await self.connect()
+                if self.connected or self._reported is not False:
+                    self.status(resp)
+                self._reported = self.connected
+
+        if self.connected:
+            self._backoff = 1
+            return self.keepalive
+        delay = self._backoff
+        self._backoff = min(2 * delay, MAX_BACKOFF)
+        return delay
+
+    @asynccontextmanager
+    async def session(self):
+        """Hold the link for a run of commands, e.g. a scan; yields ``(reader, writer)``.
+
+        Nothing else (keepalive, ``set_delays``) gets on the stream until it ends.
+        Raises ``ConnectionError`` if the DG645 can't be reached.
+        """
+        async with self._lock:
+            if not self.connected:
+                resp = await self.connect()
+                if not self.connected:
+                    raise ConnectionError(resp.strip())
+            try:
+                yield self.reader, self.writer
+            except LINK_ERRORS:
+                self._drop()
+                raise
+
+    async def query(self, command: str) -> str:
+        """Reply to ``command``; raises ``ConnectionError`` if the DG645 can't be reached."""
+        async with self._lock:
+            if not self.connected:
+                resp = await self.connect()
+                if not self.connected:
+                    raise ConnectionError(resp.strip())
+            try:
+                return await _query(self.reader, self.writer, command)
+            except LINK_ERRORS:
+                self._drop()
+                raise
 
-@no_socket_handler
-async def close(writer):
-    writer.close()
-    await writer.wait_closed()
-    return "Closed.\n"
+    async def set_delays(self, delays: dict, reference: str = "T0") -> SetResult:
+        """Set ``{channel: seconds}``, sending only the channels that differ from the shadow.
+
+        A value can also be ``(reference channel, seconds)`` to link that
+        channel to another one instead of ``reference``.
+        """
+        commands = {}
+        for ch, value in delays.items():
+            ref, delay = value if isinstance(value, tuple) else (reference, value)
+            commands[ch] = delay_command(ch, delay, ref)
+        changed = {ch: cmd for ch, cmd in commands.items() if self.delays.get(ch) != cmd}
+        if not changed:
+            return SetResult(True, "DG645: timings unchanged.\n")
+
+        async with self._lock:
+            if not self.connected:
+                resp = await self.connect()
+                if not self.connected:
+                    return SetResult(False, resp)
+            try:
+                error = await _write_batch(self.reader, self.writer, list(changed.values()))
+            except LINK_ERRORS:
+                self._drop()
+                return SetResult(False, "DG645 link lost, timings not sent.\n")
+            if error is not None:
+                for channel in changed:  # don't know which of them went in
+                    self.delays.pop(channel, None)
+                return SetResult(False, f"DG645 error setting {', '.join(changed)} ({error}).\n")
+            self.delays.update(changed)
+        return SetResult(True, f"DG645: set {', '.join(changed)}.\n")
+
+    async def close(self) -> str:
+        await super().close()
+        async with self._lock:
+            if self.writer is not None:
+                self.writer.close()
+                try:
+                    await self.writer.wait_closed()
+                except OSError:
+                    pass
+            self.reader, self.writer = None, None
+        return "DG645 connection closed.\n"
+
+
+async def test():
+    dg645 = DG645()
+    print(await dg645.connect(), end="")
+    print(await dg645.query("DLAY?2"))
+    await dg645.close()
 
 
 if __name__ == "__main__":
-    # loop = asyncio.new_event_loop()
-    # loop.run_until_complete(test())
     asyncio.run(test())
@@ -1,16 +1,14 @@
-import asyncio
 import functools
-import inspect
+import statistics
 import sys
+from dataclasses import dataclass, fields
 from pathlib import Path
 
-import DG645
-import numpy as np
-import serial
-from cniAPI import hex_sequence, make_connection, send_receive_cni
-from constants import FLASHES, MINCURR
+import timing
+from constants import CNI_GEARS, FLASHES, LOG_LINES, TIMING_DEBOUNCE
+from felesr import LaserController, nearest_gear
 from laser_timing import Ui_MainWindow
-from PyQt6.QtCore import QSettings, QTimer
+from PyQt6.QtCore import QSettings, Qt, QTimer, pyqtSignal
 from PyQt6.QtGui import QTextCursor
 from PyQt6.QtWidgets import (
     QApplication,
@@ -21,11 +19,12 @@ from PyQt6.QtWidgets import (
     QMessageBox,
     QPushButton,
     QSlider,
-    QTextBrowser,
     QTextEdit,
 )
-from serial.tools.list_ports import comports
-from vironAPI import create_reader_writer, login_command, send_receive
+from scan_dialog import ScanDialog
+from serial_ports import PortWatcher, find_port
+from status_log import StatusLog
+from WorkerThread import WorkerThread
 
 
 def bool_to_code(b: bool) -> str:  # noqa: FBT001 ignore the positional boolean
@@ -36,39 +35,78 @@ def code_to_bool(c: str) -> bool:
     return c == "I"
 
 
+def close_together(values: list) -> bool:
+    # each value within 1 us (1000 ns) of the one before it
+    return all(b - a < 1000 for a, b in zip(values, values[1:]))
+
+
+@dataclass(slots=True)
+class LaserWidgets:
+    """The controls belonging to one laser, found once by the ``<laser>_<control>`` names."""
+
+    init: QPushButton
+    enabled: QPushButton
+    power: QSlider
+    trig_diode: QPushButton
+    trig_qs: QPushButton
+    timing_diode: QDoubleSpinBox
+    timing_qs: QDoubleSpinBox
+    com: QComboBox | None = None  # CNI only
+    ip: QTextEdit | None = None  # Viron only
+    mac: QTextEdit | None = None  # Viron only
+
+    @classmethod
+    def from_ui(cls, ui, laser: str) -> "LaserWidgets":
+        return cls(**{f.name: getattr(ui, f"{laser}_{f.name}", None) for f in fields(cls)})
+
+    @property
+    def connection(self) -> list:
+        return [w for w in (self.com, self.ip, self.mac) if w is not None]
+
+    def __iter__(self):
+        return (getattr(self, f.name) for f in fields(self) if getattr(self, f.name) is not None)
+
+
 class LaserGUI(QMainWindow, Ui_MainWindow):
+    # device coroutines run on the worker thread and must only touch widgets through these
+    status_signal = pyqtSignal(str)
+    flash_signal = pyqtSignal(str)
+    state_signal = pyqtSignal()
+    ports_signal = pyqtSignal(list)
+
     def __init__(self) -> None:
         super().__init__()
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
 
-        self.lasers = {"v1": {}, "v2": {}, "c1": {}, "c2": {}, "c3": {}, "c4": {}, "c5": {}}
-        # lasers = [v for v in self.ui.__dict__.values() if '_enabled' in v.objectName()]
-        for l in self.lasers:  # noqa: E741
-            ll = self.ui.__dict__[l + "_enabled"]
-            ll.clicked.connect(self.enable)
-            ll = self.ui.__dict__[l + "_init"]
-            ll.clicked.connect(self.initialize_handler)
-            ll = self.ui.__dict__[l + "_power"]
-            ll.sliderReleased.connect(self.set_power)
-            ld = self.ui.__dict__[l + "_trig_diode"]
-            ld.clicked.connect(self.set_trigger)
-            ld.clicked.connect(self.set_timings)
-
-            lq = self.ui.__dict__[l + "_trig_qs"]
-            lq.clicked.connect(self.set_trigger)
-            lq.clicked.connect(self.set_timings)
-            self.lasers[l]["trig"] = bool_to_code(ld.isChecked()) + bool_to_code(lq.isChecked())
-
-            ll = self.ui.__dict__[l + "_timing_diode"]
-            ll.valueChanged.connect(self.set_timings)
-            ll = self.ui.__dict__[l + "_timing_qs"]
-            ll.valueChanged.connect(self.set_timings)
-
-            if l.startswith("c"):
-                ll = self.ui.__dict__[l + "_com"]
-                for port in comports():
-                    ll.addItem(port.device.split("-")[0].strip())
+        # all device control goes through the same headless controller the CLI uses
+        self.controller = LaserController(
+            status=self.status_update,
+            on_not_initialized=self.flash_signal.emit,  # flashing needs the GUI thread
+            on_update=self.state_signal.emit,
+        )
+        self.lasers = self.controller.lasers
+        self.delay_gen = self.controller.delay_gen
+        self.build_registry()
+        self.timing_timers = {}
+        for l, w in self.widgets.items():  # noqa: E741
+            w.enabled.clicked.connect(self.enable)
+            w.init.clicked.connect(self.initialize_handler)
+            w.power.sliderReleased.connect(self.set_power)
+            w.trig_diode.clicked.connect(self.set_trigger)
+            w.trig_qs.clicked.connect(self.set_trigger)
+            self.lasers[l].trig = bool_to_code(w.trig_diode.isChecked()) + bool_to_code(
+                w.trig_qs.isChecked(),
+            )
+
+            w.timing_diode.valueChanged.connect(self.set_timings)
+            w.timing_qs.valueChanged.connect(self.set_timings)
+            # typing or holding an arrow key restarts this, only the settled value gets applied
+            timer = QTimer(self)
+            timer.setSingleShot(True)
+            timer.setInterval(TIMING_DEBOUNCE)
+            timer.timeout.connect(functools.partial(self.set_timings_laser, l))
+            self.timing_timers[l] = timer
 
         # double_spin_boxes = self.findChildren(QDoubleSpinBox)
         # for box in double_spin_boxes:
@@ -92,108 +130,156 @@ class LaserGUI(QMainWindow, Ui_MainWindow):
 
         self.file_path_input = self.ui.__dict__["savepath"]
 
-        if sys.platform == "win32":
-            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-
-        # Ensure an event loop is created if one does not exist
-        self.loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(self.loop)
+        # all device I/O runs on a persistent event loop in its own thread
+        self.worker = WorkerThread(self, on_error=self.show_job_error)
+        self.worker.start()
+        # one shared port scan, repeated in the background so adapters plugged in later show up
+        self.ports = None  # until the first scan is in
+        self.com_ids = {}  # laser -> hardware id of the adapter it was last initialized on
+        self.port_watcher = PortWatcher(status=self.status_update, on_change=self.ports_signal.emit)
+        self.ports_signal.connect(self.show_com_ports)
+        self.worker.submit(self.port_watcher.start())
 
         self.flash_timer = QTimer(self)
         self.flash_timer.timeout.connect(self.toggle_button_color)
+        self.flash_signal.connect(self.flash_init_button)
+
+        self.status_log = StatusLog()
+        self.status_bar = self.ui.status
+        self.status_bar.document().setMaximumBlockCount(LOG_LINES)  # drops the oldest lines
+        self.status_signal.connect(self.show_status)
 
-        self.status_text = ""
-        self.status_bar = self.findChildren(QTextBrowser, "status")[0]
+        # keeps the DG645 link up and polls the live status of every initialized laser
+        self.state_signal.connect(self.show_states)
+        self.worker.submit(self.controller.start())
 
         times = self.ui.__dict__["send_times"]
         times.clicked.connect(self.send_times)
+        # in live mode settled timing edits go straight to the DG645
+        self.live_timer = QTimer(self)
+        self.live_timer.setSingleShot(True)
+        self.live_timer.setInterval(TIMING_DEBOUNCE)
+        self.live_timer.timeout.connect(self.push_live)
+        self.ui.overall_timing.valueChanged.connect(self.live_timer.start)
+        self.ui.live_times.toggled.connect(self.push_live)
+        self.scan_dialog = None
+        self.ui.scan.clicked.connect(self.open_scan_dialog)
+        ll = self.ui.__dict__["init_all"]
+        ll.clicked.connect(self.initialize_all)
 
         self.settings_config = QSettings("SherwinLab", "LaserControlApp")
         self.load_settings()
 
         self.make_laser_dict()
 
-    def send_times(self) -> None:
-        d = self.sender()
-        self.loop.run_until_complete(self.send_times_device(d))
-
-    async def send_times_device(self, l) -> None:
-        if (
-            not hasattr(self, "delay_gen")
-            or self.delay_gen["reader"] is None
-            or self.delay_gen["writer"] is None
-        ):
-            reader, writer, resp = await DG645.connect(ip="192.168.103.164", port="5025")
-            self.delay_gen = {}
-            self.delay_gen["reader"], self.delay_gen["writer"] = reader, writer
-            self.status_update(resp)
+    def show_com_ports(self, ports) -> None:
+        self.ports = ports
+        for l, w in self.widgets.items():  # noqa: E741
+            if w.com is None:
+                continue
+            current = w.com.currentText()  # from the saved settings, or picked meanwhile
+            if not self.lasers[l].connected:
+                # a known adapter is followed to whatever COM number it has now
+                found = find_port(ports, self.com_ids.get(l, ""))
+                if found is not None and found != current:
+                    self.status_update(f"{l}: Found its adapter on {found}.\n")
+                    current = found
+            w.com.blockSignals(True)
+            w.com.clear()
+            for i, port in enumerate(ports):
+                w.com.addItem(port.device)
+                w.com.setItemData(i, port.tooltip(), Qt.ItemDataRole.ToolTipRole)
+            if self.lasers[l].connected and w.com.findText(current) < 0:
+                w.com.addItem(current)  # unplugged while in use, still show what it's on
+            w.com.setCurrentText(current)
+            w.com.blockSignals(False)
+
+    def remember_adapter(self, l) -> None:  # noqa: E741
+        com = self.widgets[l].com.currentText()
+        for port in self.ports or []:
+            if port.device == com and port.hardware_id:
+                self.com_ids[l] = port.hardware_id
+
+    def build_registry(self) -> None:
+        # every lookup the handlers need, done once here instead of on each click
+        self.widgets = {l: LaserWidgets.from_ui(self.ui, l) for l in self.lasers}  # noqa: E741
+        self.owners = {widget: l for l, w in self.widgets.items() for widget in w}  # noqa: E741
+        self.connection_widgets = [c for w in self.widgets.values() for c in w.connection]
+
+        skipped_names = (
+            "status",
+            "_enabled",
+            "_settings",
+            "unlock_connections",
+            "_init",
+            "init_all",
+            "send_times",
+            "scan",
+        )  # all the stuff that doesn't need to be saved
+        self.saved_widgets = {
+            kind: [w for w in self.findChildren(kind) if not w.objectName().endswith(skipped_names)]
+            for kind in (QPushButton, QDoubleSpinBox, QTextEdit, QComboBox, QSlider)
+        }
 
-        if self.delay_gen["reader"] is not None and self.delay_gen["writer"] is not None:
-            cnis = [ll for ll in self.lasers if ll.startswith("c")]
-            cni_diodes = [self.ui.__dict__[ll + "_timing_diode"].value() for ll in cnis]
-            cni_qs = [self.ui.__dict__[ll + "_timing_qs"].value() for ll in cnis]
-
-            virons = [ll for ll in self.lasers if ll.startswith("v")]
-            viron_diodes = [self.ui.__dict__[ll + "_timing_diode"].value() for ll in virons]
-            viron_qs = [self.ui.__dict__[ll + "_timing_qs"].value() for ll in virons]
-
-            t0 = self.ui.__dict__["overall_timing"].value() * 1e3  # convert to ns
-            A, B = t0, t0
-
-            for laser in self.lasers:
-                self.ui.__dict__[laser + "_timing_diode"].blockSignals(True)
-                self.ui.__dict__[laser + "_timing_qs"].blockSignals(True)
-                # block these as their values are about to change
-
-            if all(
-                np.diff(cni_diodes) < 1000,
-            ):  # want to make sure they aren't sent too far apart -- within 1 ns all of them
-                A = t0 + np.mean(cni_diodes)
-                for laser in cnis:
-                    self.ui.__dict__[laser + "_timing_diode"].setValue(np.mean(cni_diodes))
-            else:
-                self.status_update("CNI diode trigger values are too far apart (<1 us required).")
+    def send_times(self) -> None:
+        # only channels that differ from what the DG645 last confirmed go out, in one message
+        delays = {
+            chan: (ref, delay * 1e-9)  # ns -> s
+            for chan, (ref, delay) in self.channel_delays().items()
+        }
+        self.worker.submit(self.controller.set_delays(delays))
+
+    def channel_delays(self) -> dict:
+        # reads (and tidies) the timing widgets on the GUI thread before handing off to the device loop
+        cnis = [ll for ll in self.lasers if ll.startswith("c")]
+        cni_diodes = [self.widgets[ll].timing_diode.value() for ll in cnis]
+
+        virons = [ll for ll in self.lasers if ll.startswith("v")]
+        viron_diodes = [self.widgets[ll].timing_diode.value() for ll in virons]
+
+        t0 = self.ui.__dict__["overall_timing"].value() * 1e3  # convert to ns
+        cni_diode, viron_diode = 0, 0
+
+        for w in self.widgets.values():
+            w.timing_diode.blockSignals(True)
+            w.timing_qs.blockSignals(True)
+            # block these as their values are about to change
+
+        if close_together(cni_diodes):  # want to make sure they aren't sent too far apart
+            cni_diode = statistics.fmean(cni_diodes)
+            for laser in cnis:
+                self.widgets[laser].timing_diode.setValue(cni_diode)
+        else:
+            self.status_update("CNI diode trigger values are too far apart (<1 us required).")
 
-            if all(np.diff(viron_diodes) < 1000):
-                B = t0 + np.mean(viron_diodes)
-                for laser in virons:
-                    self.ui.__dict__[laser + "_timing_diode"].setValue(np.mean(viron_diodes))
-            else:
-                self.status_update(
-                    "Viron diode trigger values are too far apart (<1 us required).",
-                )
-
-            for laser in self.lasers:
-                self.ui.__dict__[laser + "_timing_diode"].blockSignals(False)
-                self.ui.__dict__[laser + "_timing_qs"].blockSignals(False)
-
-            # TODO this needs to be a QLineEdit with some numpy float validation
-            C = self.ui.__dict__["c1_timing_qs"].value()
-            D = self.ui.__dict__["c2_timing_qs"].value()
-            E = self.ui.__dict__["c3_timing_qs"].value()
-            F = self.ui.__dict__["c4_timing_qs"].value()
-            X = self.ui.__dict__["c5_timing_qs"].value()
-
-            G = self.ui.__dict__["v1_timing_qs"].value()
-            H = self.ui.__dict__["v2_timing_qs"].value()
-
-            outstr = ""
-            for ind, chan in enumerate([A, B, C, D, E, F, G, H]):
-                outstr += await DG645.send_receive(
-                    self.delay_gen["reader"],
-                    self.delay_gen["writer"],
-                    f"DLAY {ind},0,{chan * 1e-6:f}\n",
-                )
-                # outstr += await DG645.send_receive(self.sock, f"LINK {ind},0\n".encode("utf-8"))
-                # outstr += await DG645.send_receive(self.sock, f"DISP 11,{ind}\n".encode("utf-8"))
-
-            # outstr += await DG645.send_receive(self.sock, f"TSRC 1\n".encode("utf-8")) # trigger externally with rising edge
-            # outstr += await DG645.send_receive(self.sock, f"HOLD 1e-3\n".encode("utf-8")) # holdoff 1 ms to account for some noise if there is any
-            # outstr += await DG645.send_receive(self.sock, f"DISP 11,{2}\n".encode("utf-8"))
-
-            self.status_update(outstr)
+        if close_together(viron_diodes):
+            viron_diode = statistics.fmean(viron_diodes)
+            for laser in virons:
+                self.widgets[laser].timing_diode.setValue(viron_diode)
         else:
-            self.status_update("Digitizer socket connection failed.\n")
+            self.status_update(
+                "Viron diode trigger values are too far apart (<1 us required).",
+            )
+
+        for w in self.widgets.values():
+            w.timing_diode.blockSignals(False)
+            w.timing_qs.blockSignals(False)
+
+        # TODO this needs to be a QLineEdit with some numpy float validation
+        qs = {l: w.timing_qs.value() for l, w in self.widgets.items()}  # noqa: E741
+
+        # QS channels are linked to their flashlamp channel, which is linked to T0 via A
+        return timing.channel_delays(t0, float(cni_diode), float(viron_diode), qs)
+
+    def push_live(self) -> None:
+        if self.ui.live_times.isChecked():
+            self.send_times()
+
+    def open_scan_dialog(self) -> None:
+        if self.scan_dialog is None:
+            self.scan_dialog = ScanDialog(self)
+        self.scan_dialog.show()
+        self.scan_dialog.raise_()
 
     def open_file_dialog(self) -> None:
         # options = QFileDialog.Option.DontUseNativeDialog
@@ -202,13 +288,7 @@ class LaserGUI(QMainWindow, Ui_MainWindow):
             self.file_path_input.setText(file_path)
 
     def unlock_connections(self) -> None:
-        connections = [
-            ii for ii in self.findChildren(QTextEdit) if ii.objectName().endswith(("_ip", "_mac"))
-        ]
-        connections += [
-            ii for ii in self.findChildren(QComboBox) if ii.objectName().endswith("_com")
-        ]
-        for conn in connections:
+        for conn in self.connection_widgets:
             conn.setEnabled(not conn.isEnabled())
             if not conn.isEnabled():
                 self.make_laser_dict()
@@ -251,241 +331,168 @@ class LaserGUI(QMainWindow, Ui_MainWindow):
                 "",
             )
 
-    def not_initialized_handler(func) -> object:
-        @functools.wraps(func)
-        async def wrapper(self, *args, **kwargs):
-            l = self.get_laser_name(self.sender())
-            try:
-                if inspect.iscoroutinefunction(func):
-                    resp = await func(self, *args, **kwargs)
-                else:
-                    resp = func(self, *args, **kwargs)
-            except (KeyError, serial.SerialException):
-                self.initialize_button = self.findChildren(QPushButton, f"{l}_init")[0]
-                self.flash_count = 0
-                self.flash_timer.start(100)
-                resp = f"{l}: Laser not initialized.\n"
-            finally:
-                if type(resp) != bytes:
-                    self.status_update(resp)
-                return resp
-
-        return wrapper
-
     def get_laser_name(self, sender: object) -> str:
-        return sender.objectName().split("_")[
-            0
-        ]  # relies on naming convention <laser><number>_<action>
+        return self.owners[sender]
 
     def make_laser_dict(self) -> None:
-        lasers = [
-            self.get_laser_name(ii)
-            for ii in self.findChildren(QPushButton)
-            if "_enabled" in ii.objectName()
-        ]
-        widgets = self.findChildren(QTextEdit)
-        for laser in lasers:
+        for laser, w in self.widgets.items():
             if laser.startswith("v"):
-                ip = next(ii.toPlainText() for ii in widgets if ii.objectName() == laser + "_ip")
-                host, port = ip.split(":")
-                mac = next(ii.toPlainText() for ii in widgets if ii.objectName() == laser + "_mac")
-                self.lasers[laser]["HOST"] = host
-                self.lasers[laser]["PORT"] = port
-                self.lasers[laser]["MAC"] = mac
+                host, port = w.ip.toPlainText().split(":")
+                self.controller.configure(laser, host=host, port=port, mac=w.mac.toPlainText())
 
     def enable(self) -> None:
-        l = self.get_laser_name(self.sender())  # noqa: E741
-        self.loop.run_until_complete(self.enable_laser(l))
+        button = self.sender()
+        l = self.get_laser_name(button)  # noqa: E741
+        fire = button.text() == "Fire"
+        self.worker.submit(
+            self.controller.enable(l, fire),
+            lambda _: button.setText("Disable" if fire else "Fire"),
+        )
 
-    async def enable_laser(self, l) -> None:
-        if l.startswith("v"):
-            await self.send_receive_laser(
-                l,
-                "$FIRE\n" if self.sender().text() == "Fire" else "$STANDBY\n",
+    def initialize_handler(self, *args, **kwargs) -> None:
+        button = self.sender()
+        l = self.get_laser_name(button)  # noqa: E741
+        if button.isChecked():
+            com = self.widgets[l].com.currentText() if l.startswith("c") else None
+            self.worker.submit(
+                self.controller.initialize(l, com, self.power_setting(l), self.trigger_code(l)),
+                functools.partial(self.show_initialized, l, button),
             )
+        else:
+            self.worker.submit(self.controller.uninitialize(l))
 
-        elif l.startswith("c"):
-            data = bytearray([0x7F, 5, 0x21, self.sender().text() == "Fire", 0, 0, 0])  # Test data
-            outstr = await self.send_receive_laser(l, data)
-            if outstr is not None:  # only do this if serialException is not raised
-                en = int(hex_sequence(outstr).split(" ")[3])
-                resp = f"{l}: {'Enabled' if en else 'Disabled'}.\n"
+    def initialize_all(self) -> None:
+        jobs = {}
+        for l in self.lasers:  # noqa: E741
+            button = self.widgets[l].init
+            if button.isChecked() or not self.configured(l):
+                continue
+            button.setChecked(True)
+            com = self.widgets[l].com.currentText() if l.startswith("c") else None
+            jobs[l] = (com, self.power_setting(l), self.trigger_code(l))
+
+        if jobs:
+            self.status_update(f"Initializing {', '.join(jobs)}.\n")
+            self.worker.submit(self.controller.initialize_all(jobs), self.show_initialized_all)
+        else:
+            self.status_update("No uninitialized lasers with connection settings.\n")
 
-        self.sender().setText("Disable" if self.sender().text() == "Fire" else "Fire")
+    def configured(self, l) -> bool:
+        if l.startswith("v"):
+            return bool(self.lasers[l].host) and bool(self.lasers[l].mac)
+        return self.widgets[l].com.currentText() not in ("", "None")
 
-        if "resp" in locals():
-            self.status_update(resp)
+    def show_initialized_all(self, results) -> None:
+        if isinstance(results, Exception):
+            self.status_update(f"Initialize all failed: {results}\n")
+            return
 
-    def initialize_handler(self, *args, **kwargs) -> None:
-        self.loop.run_until_complete(self.initialize(*args, **kwargs))
+        for l, trig in results.items():  # noqa: E741
+            self.show_initialized(l, self.widgets[l].init, trig)
 
-    async def initialize(self, *args, **kwargs) -> None:
-        l = self.get_laser_name(self.sender())  # noqa: E741
-        if l.startswith("v"):
-            if self.sender().isChecked():
-                await self.init_laser(l)
-                await self.set_power_laser(l)
-                await self.set_trigger_laser(l)
-            else:
-                await self.send_receive_laser(l, "$STOP\n")
-        elif l.startswith("c"):
-            if self.sender().isChecked():
-                await self.init_laser(l)
-                await self.set_power_laser(l)
-                await self.set_trigger_laser(l)
+        ok = [l for l in results if self.widgets[l].init.isChecked()]
+        failed = [l for l in results if l not in ok]
+        resp = f"Initialized {len(ok)}/{len(results)} lasers"
+        resp += f" (failed: {', '.join(failed)}).\n" if failed else ".\n"
+        self.status_update(resp)
+
+    def show_initialized(self, l, button, trig) -> None:
+        if self.lasers[l].connected:
+            if l.startswith("v"):
+                button.setText("Standby")
             else:
-                try:
-                    self.lasers[l]["serial"].close()
-                    del self.lasers[l]["serial"]
-                except KeyError:
-                    pass
+                self.remember_adapter(l)
+        else:
+            button.setText("Initialize")
+            button.setChecked(False)
+        self.show_trigger(l, None, trig)
 
     def set_power(self, l=None) -> None:
         if l is None:
             l = self.get_laser_name(self.sender())  # noqa: E741
-        self.loop.run_until_complete(self.set_power_laser(l))
-
-    @not_initialized_handler  # in case maxcurr is not defined
-    async def set_power_laser(self, l=None) -> None:
-        if l.startswith("v"):
-            return await self.send_receive_laser(
-                l,
-                f"$DCURR {MINCURR + (self.lasers[l]['maxcurr'] - MINCURR) / 100 * self.ui.__dict__[l + '_power'].value()}\n",
-            )
-        if l.startswith("c"):
-            gears = np.array([5, 10, 20, 30, 50, 60, 80, 100])
-            setting = self.ui.__dict__[l + "_power"].value()
-            diff = np.abs(gears - setting)
-            gear = np.argmin(diff)  # gear id is 0,1,..,6
-            self.ui.__dict__[l + "_power"].setValue(gears[gear])
-
-            data = bytearray([0x7F, 5, 0x23, gear, 0, 0, 0])  # Test data
+        self.worker.submit(self.controller.set_power(l, self.power_setting(l)))
 
-            # outstr = self.loop.run_until_complete(send_receive_cni(
-            #     self.lasers[l]["serial"], data
-            # ))
-            outstr = await self.send_receive_laser(l, data)
-            if outstr is not None:  # only do this if serialException is not raised
-                gear = int(hex_sequence(outstr).split(" ")[3])
-                resp = f"{l}: Power set to {gears[gear]}%.\n"
-
-            return resp
+    def power_setting(self, l) -> int:
+        slider = self.widgets[l].power
+        if l.startswith("c"):  # CNI only has discrete gears, snap the slider to the nearest one
+            slider.setValue(CNI_GEARS[nearest_gear(slider.value())])
+        return slider.value()
 
     def set_trigger(self, *args, **kwargs) -> None:
-        l = self.get_laser_name(self.sender())  # noqa: E741
-        self.loop.run_until_complete(self.set_trigger_laser(l))
-
-    async def set_trigger_laser(self, l=None) -> None:
-        if l is None:
-            l = self.get_laser_name(self.sender())  # noqa: E741
-
-        if "_trig_" in self.sender().objectName():
-            trig_button = self.sender()
-        else:  # need to handle auto-send from init
-            trig_button = self.ui.__dict__[l + "_trig_qs"]
-
-        trigger_buttons = [
-            ii for ii in self.findChildren(QPushButton) if f"{l}_trig_" in ii.objectName()
-        ]
-
-        other = next(
-            ii for ii in trigger_buttons if trig_button.objectName() not in ii.objectName()
+        trig_button = self.sender()
+        l = self.get_laser_name(trig_button)  # noqa: E741
+        self.worker.submit(
+            self.controller.set_trigger(l, self.trigger_code(l, trig_button)),
+            functools.partial(self.show_trigger, l, trig_button),
         )
-        trig = ""
 
-        if l.startswith("v"):
-            if "reader" in self.lasers[l] or "writer" in self.lasers[l]:
-                # checked means interal, unchecked (default) means external
-                trig = bool_to_code(
-                    self.ui.__dict__[l + "_trig_diode"].isChecked(),
-                ) + bool_to_code(self.ui.__dict__[l + "_trig_qs"].isChecked())
-
-                if trig == "IE":
-                    # IE is forbidden, can't trigger internal then external -- that would be non-causal
-                    if "_trig_" in self.sender().objectName():
-                        trig = bool_to_code(trig_button.isChecked()) + bool_to_code(
-                            trig_button.isChecked(),
-                        )
-                        other.setChecked(trig_button.isChecked())
-                    else:  # just default to EE in case it is screwed up on init
-                        trig = "EE"
-
-                self.lasers[l]["trig"] = trig
-            elif "_trig_" in self.sender().objectName():
-                self.sender().setChecked(not self.sender().isChecked())
-
-            await self.send_receive_laser(
-                l,
-                f"$TRIG {trig}\n",
-            )  # this will handle non-connected errors
-
-        elif l.startswith("c"):
-            trig = int(not trig_button.isChecked())  # want 0x01 if unchecked, 0x00 if checked
-
-            data = bytearray([0x7F, 5, 0x01, trig, 0, 0, 0])
-            outstr = await self.send_receive_laser(l, data)
-
-            if outstr is not None:  # only do this if serialException is not raised
-                other.setChecked(trig_button.isChecked())
-
-                int_trig = bool(int(hex_sequence(outstr).split(" ")[3]))
-                self.lasers[l]["trig"] = "II" if not int_trig else "EE"
-
-                resp = f"{l}: Trigger set to {'Internal' if not int_trig else 'External'}.\n"
-            elif "_trig_" in self.sender().objectName():
-                self.sender().setChecked(
-                    not self.sender().isChecked(),
-                )  # if sent here by a trigger button but there is an error, flip it
-
-            if "resp" in locals():
-                self.status_update(resp)
-
-        for button in [trig_button, other]:
+    def trigger_code(self, l, trig_button=None) -> str:
+        # checked means interal, unchecked (default) means external
+        if l.startswith("c"):  # CNI diode and QS always share one trigger source
+            button = trig_button or self.widgets[l].trig_qs
+            return bool_to_code(button.isChecked()) * 2
+
+        trig = bool_to_code(
+            self.widgets[l].trig_diode.isChecked(),
+        ) + bool_to_code(self.widgets[l].trig_qs.isChecked())
+
+        if trig == "IE":
+            # IE is forbidden, can't trigger internal then external -- that would be non-causal
+            if trig_button is not None:
+                trig = bool_to_code(trig_button.isChecked()) * 2
+            else:  # just default to EE in case it is screwed up on init
+                trig = "EE"
+        return trig
+
+    def show_trigger(self, l, trig_button, trig) -> None:
+        diode = self.widgets[l].trig_diode
+        qs = self.widgets[l].trig_qs
+        if isinstance(trig, str):
+            diode.setChecked(code_to_bool(trig[0]))
+            qs.setChecked(code_to_bool(trig[1]))
+        elif trig_button is not None:
+            # if sent here by a trigger button but there is an error, flip it
+            trig_button.setChecked(not trig_button.isChecked())
+
+        for button in [diode, qs]:
             button.setText("Internal" if button.isChecked() else "External")
 
+        self.set_timings_laser(l)
+
     def set_timings(self, *args, **kwargs) -> None:
         l = self.get_laser_name(self.sender())  # noqa: E741
-        if l.startswith("v"):
-            self.loop.run_until_complete(self.set_timings_laser(l))
-        if l.startswith("c"):
-            self.loop.run_until_complete(self.set_timings_laser(l))
+        self.timing_timers[l].start()
 
     def save_settings(self):
-        self.loop.run_until_complete(self.save_settings_laser())
+        self.save_settings_laser()
 
-    async def save_settings_laser(self):
+    def save_settings_laser(self):
         def save_widgets(settings):
             for child in buttons:
-                if not any([child.objectName().endswith(ii) for ii in skipped_names]):
-                    settings.setValue(f"{child.objectName()}", child.isChecked())
+                settings.setValue(f"{child.objectName()}", child.isChecked())
 
             for child in timings:
-                if not any([child.objectName().endswith(ii) for ii in skipped_names]):
-                    settings.setValue(f"{child.objectName()}", child.value())
-                    settings.setValue(f"{child.objectName()}_enabled", child.isEnabled())
+                settings.setValue(f"{child.objectName()}", child.value())
+                settings.setValue(f"{child.objectName()}_enabled", child.isEnabled())
 
             for child in inputs:
-                if not any([child.objectName().endswith(ii) for ii in skipped_names]):
-                    settings.setValue(f"{child.objectName()}", child.toPlainText())
-                    settings.setValue(f"{child.objectName()}_enabled", child.isEnabled())
+                settings.setValue(f"{child.objectName()}", child.toPlainText())
+                settings.setValue(f"{child.objectName()}_enabled", child.isEnabled())
 
             for child in dropdowns:
-                if not any([child.objectName().endswith(ii) for ii in skipped_names]):
-                    settings.setValue(f"{child.objectName()}", child.currentText())
+                settings.setValue(f"{child.objectName()}", child.currentText())
 
             for child in sliders:
-                if not any([child.objectName().endswith(ii) for ii in skipped_names]):
-                    settings.setValue(f"{child.objectName()}", child.value())
-
-        buttons = self.findChildren(QPushButton)
-        timings = self.findChildren(QDoubleSpinBox)
-        inputs = self.findChildren(QTextEdit)
-        dropdowns = self.findChildren(QComboBox)
-        sliders = self.findChildren(QSlider)
-        # children = set(buttons + timings + inputs + dropdowns)
-        skipped_names = set(
-            ["status", "_enabled", "_settings", "unlock_connections", "_init", "send_times"],
-        )  # all the stuff that doesn't need to be saved
+                settings.setValue(f"{child.objectName()}", child.value())
+
+            for l, hardware_id in self.com_ids.items():  # noqa: E741
+                settings.setValue(f"{l}_com_id", hardware_id)
+
+        buttons = self.saved_widgets[QPushButton]
+        timings = self.saved_widgets[QDoubleSpinBox]
+        inputs = self.saved_widgets[QTextEdit]
+        dropdowns = self.saved_widgets[QComboBox]
+        sliders = self.saved_widgets[QSlider]
 
         if not isinstance(self.sender(), QApplication):
             path = Path(self.file_path_input.toPlainText())
@@ -546,6 +553,9 @@ class LaserGUI(QMainWindow, Ui_MainWindow):
                 if not setting.endswith(
                     "_enabled",
                 ):  # skip the buttons 'enabled' settings since they do not correspond to a real widget
+                    if setting.endswith("_com_id"):
+                        self.com_ids[setting.removesuffix("_com_id")] = settings.value(setting)
+                        continue
                     try:
                         widget = self.ui.__dict__[setting]
                         widget.blockSignals(True)
@@ -564,6 +574,8 @@ class LaserGUI(QMainWindow, Ui_MainWindow):
                         elif setting.endswith("_ip") or setting.endswith("_mac"):
                             widget.setText(settings.value(setting))
                         elif setting.endswith("_com"):
+                            if widget.count() == 0:  # ports not scanned yet, keep the choice
+                                widget.addItem(settings.value(setting))
                             widget.setCurrentText(settings.value(setting))
                         elif setting == "savepath":
                             widget.setText(settings.value(setting))
@@ -571,117 +583,42 @@ class LaserGUI(QMainWindow, Ui_MainWindow):
                     except KeyError:
                         pass
 
+        if self.ports is not None:  # pick the loaded lasers' adapters out of the current ports
+            self.show_com_ports(self.ports)
         self.status_update(resp)
 
     # @not_initialized_handler
-    async def set_timings_laser(self, laser) -> None:
-        timing_inputs = [
-            ii for ii in self.findChildren(QDoubleSpinBox) if f"{laser}_timing" in ii.objectName()
-        ]
-        timing_inputs.sort(key=lambda x: x.objectName())
+    def set_timings_laser(self, laser) -> None:
+        self.timing_timers[laser].stop()  # applied now, drop any edit still waiting
+        timing_inputs = [self.widgets[laser].timing_diode, self.widgets[laser].timing_qs]
         for ind, timing_input in enumerate(timing_inputs):
-            # should be sorted to have diode then input
+            # diode then QS
             # want the timing input to be disabled if it is fixed by internal triggering
             # signalling is blocked to not double-trigger
             timing_input.blockSignals(True)
 
-            self.lasers[laser]["qsdelay"] = (
+            self.lasers[laser].qsdelay = (
                 179 if laser.startswith("v") else 244
             )  # us, hard coded 179 for viron, 244 for cni
 
             if bool(ind):  # only change QS enabled/disabled
-                timing_input.setEnabled(self.lasers[laser]["trig"][ind] == "E")
+                timing_input.setEnabled(self.lasers[laser].trig[ind] == "E")
             else:
                 timing_input.setEnabled(False)
 
-            if self.lasers[laser]["trig"] == "EE":
+            if self.lasers[laser].trig == "EE":
                 if timing_input.objectName().endswith("qs"):
                     timing_input.setValue(timing_inputs[1].value())
 
                 elif timing_input.objectName().endswith("diode"):
-                    timing_input.setValue(timing_inputs[1].value() - self.lasers[laser]["qsdelay"])
+                    timing_input.setValue(timing_inputs[1].value() - self.lasers[laser].qsdelay)
 
             timing_input.blockSignals(False)
 
         self.status_update(
             f"{laser}: Timing values set to FL={timing_inputs[0].value()}ns and QS={timing_inputs[1].value()}ns.\n",
         )
-
-    # @not_initialized_handler
-    async def init_laser(self, laser: str) -> None:
-        status_text = ""
-        try:
-            # if True:
-            if laser.startswith("v"):
-                if not ("reader" in self.lasers[laser] or "writer" in self.lasers[laser]):
-                    reader, writer, resp = await create_reader_writer(
-                        host=self.lasers[laser]["HOST"],
-                        port=self.lasers[laser]["PORT"],
-                        mac=self.lasers[laser]["MAC"],
-                    )
-                    status_text += f"{laser}: {resp}\n"
-                    resp = await send_receive(
-                        reader,
-                        writer,
-                        login_command(self.lasers[laser]["MAC"]),
-                    )
-                    status_text += f"{laser}: {resp}\n"
-                    maxcurr = await send_receive(reader, writer, "$MAXCURR ?\n")
-                    qsdelay = await send_receive(reader, writer, "$QSDELAY ?\n")
-                    self.lasers[laser]["reader"] = reader
-                    self.lasers[laser]["writer"] = writer
-                    self.lasers[laser]["maxcurr"] = float(
-                        maxcurr.replace("\r", "").replace("\x00", "").split(" ")[1],
-                    )
-                    self.lasers[laser]["qsdelay"] = (
-                        float(qsdelay.replace("\r", "").replace("\x00", "").split(" ")[1]) * 1000
-                    )  # switch qsdelay to ns from us
-                    status_text += f"{laser}: {maxcurr}\n"
-                    status_text += f"{laser}: {qsdelay}\n"
-
-                if "reader" in self.lasers[laser] and "writer" in self.lasers[laser]:
-                    resp = await send_receive(
-                        self.lasers[laser]["reader"],
-                        self.lasers[laser]["writer"],
-                        "$STANDBY\n",
-                    )
-                    self.sender().setText("Standby")
-
-                status_text += f"{laser}: {resp}\n"
-            elif laser.startswith("c"):
-                if "serial" not in self.lasers[laser]:
-                    self.lasers[laser]["serial"] = await make_connection(
-                        self.ui.__dict__[laser + "_com"].currentText(),
-                    )
-                    if self.lasers[laser]["serial"].is_open:
-                        data = bytearray([0x5D, 0x01, 0x01])  # Test data
-                        outstr = await send_receive_cni(self.lasers[laser]["serial"], data)
-                        if "DPS" in repr(outstr):  # check if communicating correctly
-                            self.status_update(f"{laser}: Initialized.\n")
-
-        except (AttributeError, serial.SerialException):  # no writer/reader
-            self.sender().setText("Initialize")
-            self.sender().setChecked(False)
-            status_text += f"{laser}: Could not initialize (power off or wrong COM?)\n"
-            raise KeyError  # raise error to trigger decorator handling
-        finally:
-            return status_text
-            # return status_text
-
-    @not_initialized_handler
-    async def send_receive_laser(self, laser: str, command: str | bytearray) -> str | bytes:
-        if laser.startswith("v"):
-            resp = await send_receive(
-                self.lasers[laser]["reader"],
-                self.lasers[laser]["writer"],
-                command,
-            )
-            return f"{laser}: {resp}\n"
-        if laser.startswith("c"):
-            resp = await send_receive_cni(self.lasers[laser]["serial"], command)
-            return resp
-            # return f"{laser}: {repr(resp)}\n"
-            # raise Exception("Telnet send-receive is sent to {laser}, which has a serial-based communication protocol.")
+        self.push_live()
 
     def toggle_button_color(self) -> None:
         self.initialize_button.setStyleSheet(
@@ -694,30 +631,51 @@ class LaserGUI(QMainWindow, Ui_MainWindow):
             self.flash_timer.stop()
             self.initialize_button.setStyleSheet("")
 
-    def scroll_to_top(self):
-        # Create a cursor at the end of the document and move the cursor there
-        cursor = self.status_bar.textCursor()
-        cursor.movePosition(QTextCursor.MoveOperation.Start)
-        self.status_bar.setTextCursor(cursor)
+    def scroll_to_bottom(self):
+        scroll_bar = self.status_bar.verticalScrollBar()
+        scroll_bar.setValue(scroll_bar.maximum())
+
+    def flash_init_button(self, l) -> None:
+        self.initialize_button = self.widgets[l].init
+        self.flash_count = 0
+        self.flash_timer.start(100)
+
+    def show_job_error(self, error) -> None:
+        # a fire-and-forget job (set_power, set_delays, ...) raised; nothing else would show it
+        self.status_update(f"Background task failed: {type(error).__name__}: {error}\n")
 
     def status_update(self, resp):
-        self.status_text = resp + self.status_text
-        self.status_bar.setText(self.status_text)
-        self.scroll_to_top()
+        # safe to call from the worker thread, the widget itself is only touched in show_status
+        self.status_signal.emit(resp)
+
+    def show_status(self, resp):
+        resp = resp.rstrip("\n")
+        if not resp:
+            return
+        self.status_log.add(resp)
+        # only the new line is laid out, the rest of the document is left alone
+        cursor = QTextCursor(self.status_bar.document())
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        if not self.status_bar.document().isEmpty():
+            cursor.insertBlock()
+        cursor.insertText(resp)
+        self.scroll_to_bottom()
+
+    def show_states(self) -> None:
+        # straight from the cache, no device I/O on the GUI thread
+        for l, state in self.lasers.items():  # noqa: E741
+            self.widgets[l].init.setToolTip(state.summary())
 
     def close_connections(self):
-        self.loop.run_until_complete(self.close_connections_devices())
-
-    async def close_connections_devices(self):
-        for laser in self.lasers:
-            if "serial" in self.lasers[laser]:
-                if self.lasers[laser]["serial"].is_open:
-                    self.lasers[laser]["serial"].close()
-            elif "writer" in self.lasers[laser]:
-                self.lasers[laser].close()
-                await self.lasers[laser].wait_closed()
-        if hasattr(self, "sock"):
-            DG645.close(self.sock)
+        self.worker.submit(self.port_watcher.close())
+        future = self.worker.submit(self.controller.close())
+        try:
+            future.result(timeout=3)
+        except Exception:  # noqa: BLE001 quitting anyway, don't hang on a dead device
+            pass
+        self.worker.stop()
+        self.status_log.close()
+
 
 
 def main() -> None:
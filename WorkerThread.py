@@ -0,0 +1,77 @@
+import asyncio
+import functools
+import logging
+import sys
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+
+class WorkerThread(QThread):
+    """Device-I/O thread that owns a persistent asyncio event loop.
+
+    Coroutines are handed over with ``submit`` and run on the loop in this
+    thread, so the Qt thread never blocks on telnet/serial/socket I/O. The
+    result (or the raised exception) comes back through the ``finished_job``
+    signal, which Qt queues onto the GUI thread. Jobs submitted without a
+    callback still have their errors reported: to ``on_error`` (also on the
+    GUI thread) if one is given, else to the log.
+    """
+
+    finished_job = pyqtSignal(object, object)  # callback, result
+
+    def __init__(self, parent=None, on_error=None) -> None:
+        super().__init__(parent)
+        self.on_error = on_error
+        if sys.platform == "win32":
+            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+        self.loop = asyncio.new_event_loop()
+        self.finished_job.connect(self._run_callback)
+
+    def run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+        # let anything still pending clean up before closing the loop
+        pending = asyncio.all_tasks(self.loop)
+        for task in pending:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        self.loop.close()
+
+    def submit(self, coro, callback=None):
+        """Schedule ``coro`` on the device loop.
+
+        ``callback`` (if given) is called on the GUI thread with the coroutine's
+        return value, or with the exception it raised. Returns the
+        ``concurrent.futures.Future`` for callers that need to wait on it.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        future.add_done_callback(functools.partial(self._emit, callback))
+        return future
+
+    def _emit(self, callback, future) -> None:
+        if future.cancelled():
+            return
+        try:
+            result = future.result()
+        except Exception as e:  # noqa: BLE001 hand the error to the GUI callback
+            if callback is None:
+                self._report(e)
+                return
+            result = e
+        if callback is not None:
+            self.finished_job.emit(callback, result)
+
+    def _report(self, error: Exception) -> None:
+        if self.on_error is not None:
+            self.finished_job.emit(self.on_error, error)
+        else:
+            logging.getLogger(__name__).error("Background job failed", exc_info=error)
+
+    def _run_callback(self, callback, result) -> None:
+        callback(result)
+
+    def stop(self, timeout: int = 3000) -> None:
+        if self.isRunning():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.wait(timeout)
@@ -0,0 +1,58 @@
+"""Benchmark cniAPI.crc16 against the original per-byte table loop.
+
+    python bench_crc16.py                # 1 KB .. 100 MB
+    python bench_crc16.py --max-ref 10e6 # skip the slow reference above 10 MB
+"""
+
+import argparse
+import os
+import time
+
+from cniAPI import CRC16_LOOKUP_TABLE, crc16
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000]
+
+
+def reference_crc16(data: bytearray) -> int:
+    crc = 0xFFFF
+    for byte in data:
+        crc = (crc >> 8) ^ CRC16_LOOKUP_TABLE[(crc ^ byte) & 0xFF]
+    return crc & 0xFFFF
+
+
+def best_of(func, data, repeat: int) -> tuple:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(data)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--max-ref", type=float, default=float("inf"), help="largest size (bytes) to run the reference on",
+    )
+    args = parser.parse_args()
+
+    crc16(os.urandom(1 << 16))  # build the lookup tables outside the timings
+
+    print(f"{'size':>12} {'reference':>12} {'crc16':>12} {'MB/s':>10} {'speedup':>8}")
+    for size in SIZES:
+        data = os.urandom(size)
+        repeat = 5 if size <= 1_000_000 else 1
+        fast, result = best_of(crc16, data, repeat)
+
+        if size <= args.max_ref:
+            ref, expected = best_of(reference_crc16, data, repeat)
+            assert result == expected, f"CRC mismatch at {size} bytes"
+            ref_str, speedup = f"{ref * 1e3:10.2f}ms", f"{ref / fast:7.1f}x"
+        else:
+            ref_str, speedup = f"{'-':>12}", f"{'-':>8}"
+
+        print(f"{size:>12,} {ref_str} {fast * 1e3:10.2f}ms {size / fast / 1e6:10.1f} {speedup}")
+
+
+if __name__ == "__main__":
+    main()
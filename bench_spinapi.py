@@ -0,0 +1,162 @@
+"""Benchmark the spinapi wrappers' per-call overhead by programming 100k instructions.
+
+    python bench_spinapi.py               # 100k pb_inst_pbonly + pb_inst_radio calls
+    python bench_spinapi.py --count 1e6
+    python bench_spinapi.py --points 1e6  # size of the pb_write_ascii/pb_get_data buffers
+
+No board or SpinCore library is needed: every pb_* symbol is bound to a C
+function that ignores its arguments (getpid), with the real prototypes set,
+so the numbers are the Python/ctypes side of each call only. The reference is
+the old wrapper style: a list copy, a ctypes.c_double wrap and a tuple per call.
+"typed" calls the prototype with argtypes directly, which is what the wrappers
+avoid for the pb_inst_* calls. The data table compares the old per-element
+ctypes array copies with passing np.int32 buffers by address.
+"""
+
+import argparse
+import ctypes
+import sys
+import time
+import types
+
+import numpy as np
+
+import spinapi
+
+ON = 0xE00000
+
+
+def stub_library(typed: bool) -> types.SimpleNamespace:
+    """Every function in ``spinapi.PROTOTYPES``, each its own pointer to a no-op C function."""
+    libc = ctypes.cdll.msvcrt if sys.platform == "win32" else ctypes.CDLL(None)
+    noop = "_getpid" if sys.platform == "win32" else "getpid"
+    lib = types.SimpleNamespace(
+        **{name: libc._FuncPtr((noop, libc)) for name in spinapi.PROTOTYPES},  # noqa: SLF001
+    )
+    if typed:
+        spinapi._set_prototypes(lib)  # noqa: SLF001
+    return lib
+
+
+def reference_inst_pbonly(func, *args):
+    t = list(args)
+    # Argument 3 must be a double
+    t[3] = ctypes.c_double(t[3])
+    args = tuple(t)
+    return func(*args)
+
+
+def reference_inst_radio(func, *args):
+    t = list(args)
+    # Argument 10 must be a double
+    t[10] = ctypes.c_double(t[10])
+    args = tuple(t)
+    return func(*args)
+
+
+def reference_write_ascii(func, fname, num_points, SW, real_data, imag_data):
+    c_real_data = (ctypes.c_int * num_points)(*real_data)
+    c_imag_data = (ctypes.c_int * num_points)(*imag_data)
+    return func(fname.encode(), num_points, SW, c_real_data, c_imag_data)
+
+
+def reference_get_data(func, num_points, real_data, imag_data):
+    c_real_data = (ctypes.c_int * num_points)(*real_data)
+    c_imag_data = (ctypes.c_int * num_points)(*imag_data)
+    real_pointer = ctypes.cast(c_real_data, ctypes.POINTER(ctypes.c_int))
+    imag_pointer = ctypes.cast(c_imag_data, ctypes.POINTER(ctypes.c_int))
+    return func(num_points, real_pointer, imag_pointer)
+
+
+def best_of(program, count: int, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        program(count)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=float, default=100_000, help="instructions per run")
+    parser.add_argument("--points", type=float, default=100_000, help="points per data buffer")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    count = int(args.count)
+    points = int(args.points)
+
+    spinapi.spinapi = stub_library(typed=True)
+    spinapi._raw = untyped = stub_library(typed=False)  # noqa: SLF001
+    pbonly, radio = spinapi.pb_inst_pbonly, spinapi.pb_inst_radio
+    typed_pbonly, typed_radio = spinapi.spinapi.pb_inst_pbonly, spinapi.spinapi.pb_inst_radio
+
+    def new_pbonly(n):
+        for i in range(n):
+            pbonly(ON | (i & 0xFFFFFF), spinapi.CONTINUE, 0, 12.5)
+
+    def old_pbonly(n):
+        for i in range(n):
+            reference_inst_pbonly(
+                untyped.pb_inst_pbonly, ON | (i & 0xFFFFFF), spinapi.CONTINUE, 0, 12.5,
+            )
+
+    def typed_pbonly_calls(n):
+        for i in range(n):
+            typed_pbonly(ON | (i & 0xFFFFFF), spinapi.CONTINUE, 0, 12.5)
+
+    def new_radio(n):
+        for i in range(n):
+            radio(0, 0, 0, 0, 1, 0, 0, i & 0xF, spinapi.CONTINUE, 0, 12.5)
+
+    def old_radio(n):
+        for i in range(n):
+            reference_inst_radio(
+                untyped.pb_inst_radio, 0, 0, 0, 0, 1, 0, 0, i & 0xF, spinapi.CONTINUE, 0, 12.5,
+            )
+
+    def typed_radio_calls(n):
+        for i in range(n):
+            typed_radio(0, 0, 0, 0, 1, 0, 0, i & 0xF, spinapi.CONTINUE, 0, 12.5)
+
+    print(f"{count:,} instructions, best of {args.repeat}")
+    print(
+        f"{'wrapper':>16} {'reference':>12} {'typed':>12} {'now':>12} {'ns/call':>9}"
+        f" {'speedup':>8}",
+    )
+    for name, old, typed, new in [
+        ("pb_inst_pbonly", old_pbonly, typed_pbonly_calls, new_pbonly),
+        ("pb_inst_radio", old_radio, typed_radio_calls, new_radio),
+    ]:
+        ref = best_of(old, count, args.repeat)
+        with_argtypes = best_of(typed, count, args.repeat)
+        fast = best_of(new, count, args.repeat)
+        print(
+            f"{name:>16} {ref * 1e3:10.1f}ms {with_argtypes * 1e3:10.1f}ms {fast * 1e3:10.1f}ms"
+            f" {fast / count * 1e9:9.0f} {ref / fast:7.2f}x",
+        )
+
+    real = np.arange(points, dtype=np.int32)
+    imag = -real
+    typed = spinapi.spinapi
+    print(f"\n{points:,}-point buffers, best of {args.repeat}")
+    print(f"{'wrapper':>16} {'reference':>12} {'now':>12} {'speedup':>8}")
+    for name, old, new in [
+        (
+            "pb_write_ascii",
+            lambda _: reference_write_ascii(typed.pb_write_ascii, "x", points, 1.0, real, imag),
+            lambda _: spinapi.pb_write_ascii("x", points, 1.0, real, imag),
+        ),
+        (
+            "pb_get_data",
+            lambda _: reference_get_data(typed.pb_get_data, points, real, imag),
+            lambda _: spinapi.pb_get_data(points, real, imag),
+        ),
+    ]:
+        ref = best_of(old, 0, args.repeat)
+        fast = best_of(new, 0, args.repeat)
+        print(f"{name:>16} {ref * 1e3:10.2f}ms {fast * 1e3:10.2f}ms {ref / fast:7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
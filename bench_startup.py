@@ -0,0 +1,88 @@
+"""Benchmark GUI startup: module imports, building the window and its first paint.
+
+    python bench_startup.py              # 5 fresh interpreters, offscreen
+    python bench_startup.py --repeat 10
+    python bench_startup.py --show       # on the real display instead of offscreen
+
+Each run is a new interpreter, so imports are measured cold (apart from the
+OS file cache). Times are from interpreter start, in ms.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# runs in the child; prints one JSON line of timings
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+
+import LaserGUI
+from PyQt6.QtCore import QEvent, QObject
+from PyQt6.QtWidgets import QApplication
+imported = time.perf_counter()
+loaded = {name: name in sys.modules for name in ("numpy", "serial.tools.list_ports", "spinapi")}
+
+app = QApplication(sys.argv)
+window = LaserGUI.LaserGUI()
+built = time.perf_counter()
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint and not hasattr(self, "painted"):
+            self.painted = time.perf_counter()
+            app.quit()
+        return False
+
+first_paint = FirstPaint()
+window.installEventFilter(first_paint)
+window.show()
+app.exec()
+
+print(json.dumps({
+    "import": imported - start,
+    "build": built - imported,
+    "first paint": first_paint.painted - start,
+    "loaded by import": loaded,
+}))
+window.close()
+"""
+
+
+def run_once(show: bool) -> dict:
+    env = dict(os.environ)
+    if not show:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters to time")
+    parser.add_argument("--show", action="store_true", help="use the real display")
+    args = parser.parse_args()
+
+    runs = [run_once(args.show) for _ in range(args.repeat)]
+    print(f"{'':>14} {'median':>10} {'min':>10} {'max':>10}")
+    for key in ("import", "build", "first paint"):
+        times = [run[key] * 1e3 for run in runs]
+        print(
+            f"{key:>14} {statistics.median(times):8.1f}ms {min(times):8.1f}ms {max(times):8.1f}ms",
+        )
+    for name, loaded in runs[-1]["loaded by import"].items():
+        print(f"{name:>24} imported with LaserGUI: {loaded}")
+
+
+if __name__ == "__main__":
+    main()
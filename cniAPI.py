@@ -1,63 +1,192 @@
-import serial
 import asyncio
-from functools import partial
-
-async def make_connection(com) -> serial:
-    loop = asyncio.get_event_loop()
-    kwargs = {
-            "port":com,
-            "baudrate":115200,
-            "bytesize":serial.EIGHTBITS,
-            "parity":serial.PARITY_NONE,
-            "stopbits":serial.STOPBITS_ONE,
-            "timeout":1} 
-    return await loop.run_in_executor(None,
-        partial(serial.Serial, **kwargs))
+import logging
+import math
+import struct
+import sys
+from collections import deque
+from dataclasses import dataclass
 
-def hex_sequence(data: bytearray) -> str:
-    return ' '.join(format(b, '02X') for b in data)
+import serial
+import serial_asyncio
 
-def parse_hex_sequence(data: str):
-    seq = data.split(" ")
-    head = seq[0]
-    length = int(seq[1], 16)
-    opcode = seq[2]
-    str = ""
-    try:
-        data = bytes.fromhex("".join(seq[3:3 + length-1])).decode("ascii")
-        return data
-    except UnicodeDecodeError:
-        for k in range(length):
+SERIAL_SETTINGS = {
+    "baudrate": 115200,
+    "bytesize": serial.EIGHTBITS,
+    "parity": serial.PARITY_NONE,
+    "stopbits": serial.STOPBITS_ONE,
+}
+TIMEOUT = 1  # s to wait for a reply
+HEADERS = (0x7F, 0x5D)  # first byte of every frame: commands/replies and the identify query
+IDENTIFY = (0x5D, 0x01, 0x01)  # answered with the model string ("DPS..."), safe to send any time
+
+log = logging.getLogger(__name__)
+
+
+class FrameError(serial.SerialException):
+    """A reply arrived but failed its CRC check."""
+
+
+@dataclass(slots=True)
+class CNIFrame:
+    """One decoded CNI frame, read straight from the wire bytes."""
+
+    header: int
+    length: int  # opcode + payload bytes
+    opcode: int
+    payload: bytes
+    crc: int
+    is_valid: bool
+
+    @classmethod
+    def from_bytes(cls, data) -> "CNIFrame":
+        view = memoryview(data)
+        header, length, opcode = struct.unpack_from("<BBB", view)
+        end = 2 + length
+        (crc,) = struct.unpack_from("<H", view, end)
+        return cls(header, length, opcode, bytes(view[3:end]), crc, crc16(view[:end]) == crc)
+
+    @property
+    def value(self) -> int:
+        """First payload byte, which is where set commands echo the new state."""
+        return self.payload[0]
+
+    def text(self) -> str:
+        try:
+            return self.payload.decode("ascii")
+        except UnicodeDecodeError as e:  # report how far it got, like parse_hex_sequence used to
+            text = self.payload[: e.start].decode("ascii")
+            return f"Translated up to {text}. Error at index {3 + e.start}."
+
+    def __bytes__(self) -> bytes:
+        head = struct.pack("<BBB", self.header, self.length, self.opcode)
+        return head + self.payload + struct.pack("<H", self.crc)
+
+
+class FrameDecoder:
+    """Incremental decoder for CNI frames.
+
+    A frame is a header byte, a length byte, ``length`` bytes of opcode and
+    payload, then the CRC16 of everything before it (little endian). Bytes can
+    be fed in any chunking; a frame is returned as soon as its last byte is in.
+    """
+
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+
+    def reset(self) -> None:
+        self.buffer.clear()
+
+    def feed(self, data: bytes) -> list:
+        self.buffer += data
+        frames = []
+        while True:
+            # drop anything that can't be the start of a frame (e.g. a stray 0x0A)
+            start = next((i for i, b in enumerate(self.buffer) if b in HEADERS), len(self.buffer))
+            del self.buffer[:start]
+            if len(self.buffer) < 2:
+                break
+            end = 2 + self.buffer[1] + 2
+            if len(self.buffer) < end:
+                break
+
+            frame = CNIFrame.from_bytes(bytes(self.buffer[:end]))
+            if not frame.is_valid:
+                del self.buffer[:1]  # resync on the next header byte
+                raise FrameError(f"CRC mismatch in frame {hex_sequence(bytes(frame))}")
+            del self.buffer[:end]
+            frames.append(frame)
+        return frames
+
+
+class CNITransport:
+    """Serial link to one CNI laser on native asyncio streams.
+
+    Reads and writes are driven by the event loop itself, so waiting on a
+    reply doesn't tie up an executor thread. One request is in flight at a time,
+    and its reply is the first frame that echoes its opcode: late replies to
+    requests that timed out are thrown away, whether they are still in the
+    input buffer when the next request goes out or arrive after it.
+    """
+
+    def __init__(self, reader, writer) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.decoder = FrameDecoder()
+        self._frames = deque()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    async def open(cls, com: str) -> "CNITransport":
+        reader, writer = await serial_asyncio.open_serial_connection(url=com, **SERIAL_SETTINGS)
+        return cls(reader, writer)
+
+    @property
+    def is_open(self) -> bool:
+        return not self.writer.is_closing()
+
+    def close(self) -> None:
+        self.writer.close()
+
+    async def send_receive(self, data: bytearray) -> CNIFrame:
+        async with self._lock:
+            # anything left over belongs to an earlier request that already gave up
+            await self._discard_input()
+            self.decoder.reset()
+            self._frames.clear()
+            self.writer.write(data)
+            await self.writer.drain()
+            return await self._read_reply(data[2])
+
+    async def _discard_input(self) -> None:
+        """Throw away whatever has already been received, without waiting for more."""
+        while True:
             try:
-                str = bytes.fromhex("".join(seq[3:3 + k])).decode("ascii")
-            except UnicodeDecodeError:
-                return f"Translated up to {str}. Error at index {3+k}."
+                # a zero timeout still lets a read of already-buffered bytes complete
+                async with asyncio.timeout(0):
+                    chunk = await self.reader.read(4096)
+            except TimeoutError:
+                return
+            if not chunk:
+                return  # closed; the write will find out
+            log.warning("Discarded %d stale bytes: %s", len(chunk), hex_sequence(chunk))
+
+    async def _read_reply(self, opcode: int) -> CNIFrame:
+        try:
+            async with asyncio.timeout(TIMEOUT):
+                while True:
+                    while self._frames:
+                        frame = self._frames.popleft()
+                        if frame.opcode == opcode:
+                            return frame
+                        log.warning(
+                            "Dropped reply %s to another request", hex_sequence(bytes(frame)),
+                        )
+                    chunk = await self.reader.read(256)
+                    if not chunk:
+                        raise serial.SerialException("Serial connection closed")
+                    self._frames.extend(self.decoder.feed(chunk))
+        except TimeoutError:
+            raise serial.SerialException("No connection found") from None
+
+
+async def make_connection(com) -> CNITransport:
+    return await CNITransport.open(com)
 
+def hex_sequence(data: bytearray) -> str:
+    return ' '.join(format(b, '02X') for b in data)
 
-# Function to send data
-def send_data(ser: serial, data: bytearray):
-    ser.write(data)  # Send data as bytes
-    return ser
+def parse_hex_sequence(data: str):
+    return CNIFrame.from_bytes(bytes.fromhex(data)).text()
 
-# Function to receive data
-def receive_data(ser):
-    data = ser.readline()  # Read a line of data from the serial buffer
-    if data == b'':
-        raise serial.SerialException("No connection found")
-    return ser, data
 
 # Example communication with the serial device
-async def send_receive_cni(ser, data):
+async def send_receive_cni(ser: CNITransport, data) -> CNIFrame:
     # try:
     # data = bytearray([0x7F, 5, 0x23, 6, 0, 0, 0])  # Test data
     checksum = crc16(data)
     data.extend(checksum.to_bytes(2, 'little'))
 
-    loop = asyncio.get_event_loop()
-
-    args = [ser, data]
-    ser = await loop.run_in_executor(None, partial(send_data, *args))  # Send a message
-    ser, resp = await loop.run_in_executor(None, partial(receive_data, ser))  # Read response from the device
+    resp = await ser.send_receive(data)  # Send a message and read the response from the device
     # outstr = f"{'Sent':<10} : {hex_sequence(data)}\n{'Response':<10} : {hex_sequence(resp)}"
     # outstr += f"{'Translated':<10} : {parse_hex_sequence(hex_sequence(resp))}"
     # return outstr
@@ -99,16 +228,104 @@ CRC16_LOOKUP_TABLE = [
 0x8201, 0x42C0, 0x4380, 0x8341, 0x4100, 0x81C1, 0x8081, 0x4040
 ]
 
+WORD_MIN = 256  # bytes; from here on the 16-bit word table pays for itself
+NUMPY_MIN = 1 << 16  # bytes; from here on the NumPy lane path is used if NumPy is installed
+_word_table = None
+
+
 def crc16(data: bytearray) -> int:
-    crc = 0xFFFF  # Initialize CRC to 0xFFFF as standard for CRC16
-    
-    for byte in data:
+    return crc16_update(0xFFFF, data)  # Initialize CRC to 0xFFFF as standard for CRC16
+
+
+def crc16_update(crc: int, data) -> int:
+    """Continue the CRC16 ``crc`` over ``data``.
+
+    ``data`` can be anything exposing the buffer protocol (bytes, bytearray,
+    memoryview, mmap, NumPy arrays); it is never copied, so a long capture can
+    be checked in pieces with ``crc = crc16_update(crc, chunk)``. This is the
+    reflected 0xA001 (Modbus) CRC, which ``binascii.crc_hqx`` doesn't cover.
+    """
+    view = memoryview(data).cast("B")
+    if len(view) >= NUMPY_MIN:
+        try:
+            return _crc16_numpy(crc, view)
+        except ImportError:
+            pass
+    if len(view) >= WORD_MIN:
+        return _crc16_words(crc, view)
+    return _crc16_bytes(crc, view)
+
+
+def _crc16_bytes(crc: int, view) -> int:
+    table = CRC16_LOOKUP_TABLE
+    for byte in view:
         # XOR byte with the current CRC value and lookup the result in the table
-        crc = (crc >> 8) ^ CRC16_LOOKUP_TABLE[(crc ^ byte) & 0xFF]
-    
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
     return crc & 0xFFFF  # Return CRC as a 16-bit value
 
 
+def _zero_bytes(crc: int, n: int) -> int:
+    for _ in range(n):
+        crc = (crc >> 8) ^ CRC16_LOOKUP_TABLE[crc & 0xFF]
+    return crc
+
+
+def _get_word_table() -> list:
+    # a byte only ever XORs into the low byte of the state, so two bytes b0, b1 are the
+    # same as feeding two zero bytes after XORing the state with the word b0 | b1 << 8
+    global _word_table
+    if _word_table is None:
+        _word_table = [_zero_bytes(x, 2) for x in range(1 << 16)]
+    return _word_table
+
+
+def _crc16_words(crc: int, view) -> int:
+    if len(view) % 2:
+        crc = _crc16_bytes(crc, view[:1])
+        view = view[1:]
+    if sys.byteorder != "little":
+        return _crc16_bytes(crc, view)
+    table = _get_word_table()
+    for word in view.cast("H"):
+        crc = table[crc ^ word]
+    return crc
+
+
+def _crc16_numpy(crc: int, view) -> int:
+    import numpy as np
+
+    # split the buffer into equal chunks (lanes), CRC all lanes side by side from a zero
+    # state, then chain them: crc(s, a + b) = crc(crc(s, a), zeros) ^ crc(0, b)
+    width = max(2, int(math.isqrt(2 * len(view)))) // 2  # words per lane
+    lanes = len(view) // (2 * width)
+    words = np.frombuffer(view, dtype="<u2", count=lanes * width).reshape(lanes, width)
+    words = np.ascontiguousarray(words.T)
+
+    table = np.array(_get_word_table(), dtype=np.uint16)
+    state = np.zeros(lanes, dtype=np.uint16)
+    for column in words:
+        state = table[state ^ column]
+
+    # what shifting a state through one lane of zeros does, one table per state byte
+    basis = table[np.array([1 << bit for bit in range(16)], dtype=np.uint16)]
+    for _ in range(width - 1):
+        basis = table[basis]
+    shift_lo = [_xor_bits(basis[:8], v) for v in range(256)]
+    shift_hi = [_xor_bits(basis[8:], v) for v in range(256)]
+
+    for lane in state.tolist():
+        crc = shift_lo[crc & 0xFF] ^ shift_hi[crc >> 8] ^ lane
+    return _crc16_words(crc, view[lanes * 2 * width:])
+
+
+def _xor_bits(basis, value: int) -> int:
+    out = 0
+    for bit, column in enumerate(basis.tolist()):
+        if value >> bit & 1:
+            out ^= column
+    return out
+
+
 if __name__ == "__main__":
     loop = asyncio.new_event_loop()
     ser = loop.run_until_complete(make_connection("COM3"))
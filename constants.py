@@ -2,3 +2,13 @@
 
 FLASHES = 10
 MINCURR = 128
+INIT_TIMEOUT = 10  # s, per laser when initializing all at once
+CNI_GEARS = [5, 10, 20, 30, 50, 60, 80, 100]  # % power for each CNI gear id
+POLL_FIRING = 0.5  # s between status polls while any laser is firing
+POLL_STANDBY = 5  # s between status polls otherwise
+LOG_LINES = 1000  # status messages kept in memory and in the status box
+LOG_FILE = "status.log"  # older messages end up here, next to the app
+LOG_BYTES = 1_000_000  # rotate the log file at this size
+LOG_BACKUPS = 3  # rotated files kept
+TIMING_DEBOUNCE = 300  # ms without edits before a timing change is applied
+PORT_SCAN = 2  # s between serial port rescans, so adapters plugged in later show up
@@ -0,0 +1,192 @@
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+
+from DG645 import CHANNELS, ESR_ERRORS, delay_command
+from timing import FL_CHANNELS, QS_CHANNELS, REFERENCES
+
+PIPELINE = 8  # steps allowed on the wire ahead of their confirmation
+TIMEOUT = 1  # s to wait for a step's confirmation
+
+# the DG645 output behind each laser timing; flashlamps share one output per family
+LASER_CHANNELS = {
+    **{f"c{n}_diode": FL_CHANNELS["c"] for n in range(1, 6)},
+    **{f"v{n}_diode": FL_CHANNELS["v"] for n in range(1, 3)},
+    **{f"{laser}_qs": channel for laser, channel in QS_CHANNELS.items()},
+}
+
+
+def default_reference(channel: str) -> str:
+    """The channel ``channel`` (a letter or laser timing) is linked to in ``timing``, else T0.
+
+    Scanning against it keeps the link, so the scanned delays are offsets from it.
+    """
+    return REFERENCES.get(resolve_channel(channel), "T0")
+
+
+def resolve_channel(name: str) -> str:
+    """DG645 channel letter for ``name``, either a letter or a laser timing like ``c3_qs``."""
+    if name in CHANNELS:
+        return name
+    try:
+        return LASER_CHANNELS[name]
+    except KeyError:
+        raise ValueError(f"Unknown channel {name!r}") from None
+
+
+def delay_range(start: float, stop: float, step: float) -> list:
+    """``start`` to ``stop`` inclusive in steps of ``step`` (which may be negative)."""
+    if step == 0:
+        raise ValueError("Scan step can't be 0")
+    count = math.floor((stop - start) / step + 1e-9) + 1
+    return [start + i * step for i in range(max(count, 0))]
+
+
+@dataclass(slots=True)
+class ScanStep:
+    index: int
+    delay: float  # s
+    written: float  # time.time() the DLAY went out
+    confirmed: float | None = None  # time.time() the DG645 acknowledged it
+
+
+class DelayScan:
+    """Steps one DG645 channel through a list of delays.
+
+    Step ``i`` is written ``i * dwell`` seconds after the start (shifted by any
+    pauses), as ``DLAY ...;*ESR?`` so each one is confirmed by its own reply.
+    Delays are after ``reference``, which defaults to ``default_reference``:
+    a linked channel (the Viron flashlamp, a Q-switch) is scanned as its offset
+    from the channel it hangs off, so the link stays (see ``timing``).
+    Up to ``window`` steps can be out ahead of their replies, so a short dwell
+    isn't held back by the round trip. The scan holds the DG645 link for its
+    whole run; ``pause``, ``resume`` and ``abort`` must be called on the loop
+    it runs on.
+
+        scan = DelayScan.from_range(delay_gen, "c3_qs", 179e-6, 181e-6, 10e-9, dwell=0.1)
+        steps = await scan.run()
+    """
+
+    def __init__(
+        self, delay_gen, channel, delays, dwell=0.0, reference=None, window=PIPELINE,
+        on_step=None,
+    ) -> None:
+        self.delay_gen = delay_gen
+        self.channel = resolve_channel(channel)
+        self.reference = reference or default_reference(self.channel)
+        self.delays = list(delays)
+        self.dwell = dwell
+        self.window = window
+        self.on_step = on_step or (lambda step: None)
+        self.steps = []
+        self.error = None
+        self._running = asyncio.Event()
+        self._running.set()
+        self._aborted = asyncio.Event()
+
+    @classmethod
+    def from_range(cls, delay_gen, channel, start, stop, step, **kwargs) -> "DelayScan":
+        return cls(delay_gen, channel, delay_range(start, stop, step), **kwargs)
+
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set()
+
+    @property
+    def aborted(self) -> bool:
+        return self._aborted.is_set()
+
+    def pause(self) -> None:
+        self._running.clear()
+
+    def resume(self) -> None:
+        self._running.set()
+
+    def abort(self) -> None:
+        self._aborted.set()
+        self._running.set()  # let a paused scan see it
+
+    async def run(self) -> list:
+        """Run the scan and return its steps.
+
+        An instrument error stops the scan and is left in ``error``; a lost link
+        (``ConnectionError``, ``OSError``) is raised.
+        """
+        async with self.delay_gen.session() as (reader, writer):
+            in_flight = asyncio.Queue()
+            slots = asyncio.Semaphore(self.window)
+            confirmer = asyncio.create_task(self._confirm(reader, in_flight, slots))
+            try:
+                await self._write(writer, in_flight, slots, confirmer)
+                in_flight.put_nowait(None)
+                await confirmer
+            finally:
+                confirmer.cancel()
+
+            if self.error is not None:
+                writer.write(b"LERR?\n")
+                await writer.drain()
+                lerr = (await asyncio.wait_for(reader.readline(), TIMEOUT)).decode("ascii").strip()
+                self.error += f", LERR={lerr}"
+
+            # keep set_delays' shadow in step with what the channel was left at
+            done = [step for step in self.steps if step.confirmed is not None]
+            if done and self.error is None:
+                last = delay_command(self.channel, done[-1].delay, self.reference)
+                self.delay_gen.delays[self.channel] = last
+            else:
+                self.delay_gen.delays.pop(self.channel, None)
+        return self.steps
+
+    async def _write(self, writer, in_flight, slots, confirmer) -> None:
+        start = time.monotonic()
+        for index, delay in enumerate(self.delays):
+            if self.paused:
+                paused_at = time.monotonic()
+                await self._running.wait()
+                start += time.monotonic() - paused_at
+            if self.aborted or self.error is not None:
+                return
+
+            await self._sleep(start + index * self.dwell - time.monotonic())
+            if self.aborted or not await self._take_slot(slots, confirmer):
+                return
+
+            command = delay_command(self.channel, delay, self.reference)
+            writer.write(f"{command};*ESR?\n".encode("ascii"))
+            step = ScanStep(index, delay, time.time())
+            self.steps.append(step)
+            in_flight.put_nowait(step)
+            await writer.drain()
+
+    async def _confirm(self, reader, in_flight, slots) -> None:
+        # every step gets its reply read, even after an error, so none is left on the stream
+        while (step := await in_flight.get()) is not None:
+            line = await asyncio.wait_for(reader.readline(), TIMEOUT)
+            if not line:
+                raise ConnectionResetError("DG645 closed the connection")
+            esr = int(line)
+            slots.release()
+            if esr & ESR_ERRORS:
+                if self.error is None:
+                    self.error = f"step {step.index} ({step.delay:.6e} s): ESR={esr}"
+                continue
+            step.confirmed = time.time()
+            self.on_step(step)
+
+    async def _take_slot(self, slots, confirmer) -> bool:
+        # a dead confirmer would never free a slot, so don't wait on it alone
+        take = asyncio.ensure_future(slots.acquire())
+        await asyncio.wait({take, confirmer}, return_when=asyncio.FIRST_COMPLETED)
+        if take.done():
+            return True
+        take.cancel()
+        return False
+
+    async def _sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            try:
+                await asyncio.wait_for(self._aborted.wait(), seconds)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,9 @@
+"""Headless control of the FEL-ESR lasers, DG645 and PulseBlaster, without Qt.
+
+``LaserController`` is what the GUI drives; ``python -m felesr`` is a
+command-line front end to the same thing for scripts and cron jobs.
+"""
+
+from felesr.controller import LASERS, LaserController, nearest_gear
+
+__all__ = ["LASERS", "LaserController", "nearest_gear"]
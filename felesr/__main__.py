@@ -0,0 +1,309 @@
+"""Control the FEL-ESR lasers and the DG645 from the command line.
+
+    python -m felesr --settings lab.ini init-all
+    python -m felesr --settings lab.ini fire v1
+    python -m felesr --ip v1=192.168.1.20:23 --mac v1=00:11:22:33:44:55 status v1
+    python -m felesr delays --set A=1.5us --set C=A+244us
+    python -m felesr delays
+
+Connection settings come from an .ini saved by the GUI ("Save settings"),
+and can be overridden per laser with --ip/--mac/--com. Each run opens the
+links it needs and closes them again; the lasers keep whatever state they
+were left in. Viron lasers only take one telnet client, so don't run this
+against a laser the GUI is connected to.
+"""
+
+import argparse
+import asyncio
+import configparser
+import re
+import sys
+
+import DG645
+from felesr.controller import LASERS, TRIGGER_CODES, LaserController
+from serial_ports import find_port, list_ports
+
+UNITS = {"s": 1, "ms": 1e-3, "us": 1e-6, "ns": 1e-9, "ps": 1e-12}
+DELAY = re.compile(r"^(?:(T0|T1|[A-H])([+-]))?([0-9.eE+-]+)\s*(s|ms|us|ns|ps)?$")
+
+
+def parse_delay(text: str) -> tuple:
+    """``1.5us`` -> ``("T0", 1.5e-6)``, ``A+244us`` -> ``("A", 2.44e-4)``."""
+    match = DELAY.match(text.strip())
+    if match is None:
+        raise argparse.ArgumentTypeError(f"Bad delay {text!r}, expected e.g. 1.5us or A+244us")
+    reference, sign, number, unit = match.groups()
+    delay = float(number) * UNITS[unit or "s"]
+    return reference or "T0", -delay if sign == "-" else delay
+
+
+def parse_assignment(text: str) -> tuple:
+    key, sep, value = text.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"Expected NAME=VALUE, got {text!r}")
+    return key.strip(), value.strip()
+
+
+def read_settings(path) -> dict:
+    """Widget values from an .ini written by the GUI (QSettings IniFormat)."""
+    parser = configparser.ConfigParser(interpolation=None)
+    if not parser.read(path):
+        raise SystemExit(f"Can't read settings file {path}")
+    section = parser["General"] if parser.has_section("General") else parser.defaults()
+    return {key: value.strip('"') for key, value in section.items()}
+
+
+def trigger_from_settings(laser: str, settings: dict) -> str:
+    def code(key):
+        return "I" if settings.get(f"{laser}_{key}") == "true" else "E"
+
+    if laser.startswith("c"):  # CNI diode and QS always share one trigger source
+        return code("trig_qs") * 2
+    trig = code("trig_diode") + code("trig_qs")
+    return trig if trig in TRIGGER_CODES else "EE"
+
+
+class Session:
+    """What one command needs: the controller plus each laser's COM port and init settings."""
+
+    def __init__(self, args) -> None:
+        dg645 = {}
+        if args.dg645:
+            host, _, port = args.dg645.partition(":")
+            dg645 = {"dg645_ip": host, "dg645_port": int(port) if port else DG645.PORT}
+        self.controller = LaserController(status=self.print, **dg645)
+        self.settings = read_settings(args.settings) if args.settings else {}
+        self.coms = {}
+
+        for laser in LASERS:
+            ip = self.settings.get(f"{laser}_ip")
+            if ip and ":" in ip:
+                host, port = ip.split(":")
+                self.controller.configure(laser, host=host, port=port)
+            if self.settings.get(f"{laser}_mac"):
+                self.controller.configure(laser, mac=self.settings[f"{laser}_mac"])
+            if self.settings.get(f"{laser}_com") not in (None, "", "None"):
+                self.coms[laser] = self.settings[f"{laser}_com"]
+        self.find_adapters()
+
+        for laser, ip in args.ip:
+            host, _, port = ip.partition(":")
+            self.controller.configure(laser, host=host, port=port or "23")
+        for laser, mac in args.mac:
+            self.controller.configure(laser, mac=mac)
+        for laser, com in args.com:
+            self.coms[laser] = com
+
+    def find_adapters(self) -> None:
+        # the GUI remembers each CNI's USB adapter; it may be on a different COM number now
+        ids = {laser: self.settings.get(f"{laser}_com_id") for laser in LASERS}
+        ids = {laser: hardware_id for laser, hardware_id in ids.items() if hardware_id}
+        if not ids:
+            return
+        ports = list_ports()
+        for laser, hardware_id in ids.items():
+            found = find_port(ports, hardware_id)
+            if found is not None:
+                self.coms[laser] = found
+
+    @staticmethod
+    def print(resp: str) -> None:
+        print(resp, end="", flush=True)
+
+    def configured(self, laser: str) -> bool:
+        if laser.startswith("v"):
+            state = self.controller.lasers[laser]
+            return bool(state.host) and bool(state.mac)
+        return laser in self.coms
+
+    def check_configured(self, lasers) -> bool:
+        missing = [laser for laser in lasers if not self.configured(laser)]
+        for laser in missing:
+            print(f"{laser}: No connection settings (use --settings or --ip/--mac/--com).")
+        return not missing
+
+    def init_jobs(self, lasers) -> dict:
+        """``{laser: (com, power, trig)}`` for ``LaserController.initialize_all``."""
+        jobs = {}
+        for laser in lasers:
+            power = self.settings.get(f"{laser}_power")
+            jobs[laser] = (
+                self.coms.get(laser),
+                int(power) if power is not None else None,
+                trigger_from_settings(laser, self.settings),
+            )
+        return jobs
+
+    async def connect(self, lasers) -> bool:
+        if not self.check_configured(lasers):
+            return False
+        await asyncio.gather(*(self.connect_one(laser) for laser in lasers))
+        return all(self.controller.lasers[laser].connected for laser in lasers)
+
+    async def connect_one(self, laser: str) -> None:
+        print(await self.controller.connect(laser, self.coms.get(laser)), end="")
+
+    async def initialize(self, lasers) -> int:
+        results = await self.controller.initialize_all(self.init_jobs(lasers))
+        ok = [laser for laser in results if self.controller.lasers[laser].connected]
+        print(f"Initialized {len(ok)}/{len(results)} lasers.")
+        return 0 if len(ok) == len(results) else 1
+
+
+async def init_all(session, args) -> int:
+    lasers = [laser for laser in LASERS if session.configured(laser)]
+    if not lasers:
+        print("No lasers with connection settings.")
+        return 1
+    return await session.initialize(lasers)
+
+
+async def init(session, args) -> int:
+    if not session.check_configured(args.lasers):
+        return 1
+    return await session.initialize(args.lasers)
+
+
+async def fire(session, args) -> int:
+    if not await session.connect(args.lasers):
+        return 1
+    for laser in args.lasers:
+        await session.controller.enable(laser, args.command == "fire")
+    return 0
+
+
+async def stop(session, args) -> int:
+    if not await session.connect(args.lasers):
+        return 1
+    for laser in args.lasers:
+        await session.controller.uninitialize(laser)
+    return 0
+
+
+async def power(session, args) -> int:
+    if not await session.connect([args.laser]):
+        return 1
+    await session.controller.set_power(args.laser, args.percent)
+    return 0
+
+
+async def trigger(session, args) -> int:
+    if not await session.connect([args.laser]):
+        return 1
+    return 0 if await session.controller.set_trigger(args.laser, args.code) else 1
+
+
+async def status(session, args) -> int:
+    lasers = args.lasers or [laser for laser in LASERS if session.configured(laser)]
+    if not lasers:
+        print("No lasers with connection settings.")
+        return 1
+    if not await session.connect(lasers):
+        return 1
+    await session.controller.poller.poll()
+    for laser in lasers:
+        print(session.controller.lasers[laser].summary().replace("\n", "; "))
+    return 0
+
+
+async def delays(session, args) -> int:
+    controller = session.controller
+    if args.set:
+        if not (await controller.set_delays(dict(args.set))).ok:
+            return 1
+    try:
+        current = await controller.get_delays()
+    except (OSError, ValueError, asyncio.TimeoutError) as e:
+        print(f"Could not read the DG645 delays: {e}")
+        return 1
+    for channel, (reference, delay) in current.items():
+        print(f"{channel} = {reference} + {delay:.12e} s")
+    return 0
+
+
+def channel_delay(text: str) -> tuple:
+    channel, value = parse_assignment(text)
+    if channel not in "ABCDEFGH" or len(channel) != 1:
+        raise argparse.ArgumentTypeError(f"Unknown channel {channel!r}, expected A-H")
+    return channel, parse_delay(value)
+
+
+def laser_name(text: str) -> str:
+    if text not in LASERS:
+        raise argparse.ArgumentTypeError(f"Unknown laser {text!r}, expected {', '.join(LASERS)}")
+    return text
+
+
+def laser_setting(text: str) -> tuple:
+    laser, value = parse_assignment(text)
+    return laser_name(laser), value
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="felesr",
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="\n".join(__doc__.splitlines()[1:]),
+    )
+    parser.add_argument("--settings", help=".ini file saved from the GUI")
+    parser.add_argument("--dg645", metavar="HOST[:PORT]", help="DG645 address")
+    for name, metavar in [
+        ("--ip", "LASER=HOST:PORT"),
+        ("--mac", "LASER=MAC"),
+        ("--com", "LASER=PORT"),
+    ]:
+        parser.add_argument(name, type=laser_setting, action="append", default=[], metavar=metavar)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sub = commands.add_parser("init-all", help="initialize every configured laser")
+    sub.set_defaults(func=init_all)
+    sub = commands.add_parser("init", help="initialize lasers with power and trigger from settings")
+    sub.add_argument("lasers", nargs="+", choices=LASERS)
+    sub.set_defaults(func=init)
+    for name, func, help_text in [
+        ("fire", fire, "start firing"),
+        ("standby", fire, "stop firing, stay ready"),
+        ("stop", stop, "stop the laser ($STOP / close the CNI port)"),
+    ]:
+        sub = commands.add_parser(name, help=help_text)
+        sub.add_argument("lasers", nargs="+", choices=LASERS)
+        sub.set_defaults(func=func)
+
+    sub = commands.add_parser("power", help="set the power in percent")
+    sub.add_argument("laser", choices=LASERS)
+    sub.add_argument("percent", type=float)
+    sub.set_defaults(func=power)
+
+    sub = commands.add_parser("trigger", help="set the trigger source, diode then QS (E/I)")
+    sub.add_argument("laser", choices=LASERS)
+    sub.add_argument("code", choices=TRIGGER_CODES)
+    sub.set_defaults(func=trigger)
+
+    sub = commands.add_parser("status", help="poll and print the status of the lasers")
+    sub.add_argument("lasers", nargs="*", type=laser_name, metavar="LASER")
+    sub.set_defaults(func=status)
+
+    sub = commands.add_parser("delays", help="show (and with --set, change) the DG645 delays")
+    sub.add_argument("--set", type=channel_delay, action="append", default=[], metavar="CH=DELAY")
+    sub.set_defaults(func=delays)
+    return parser
+
+
+async def run(args) -> int:
+    session = Session(args)
+    try:
+        return await args.func(session, args)
+    finally:
+        await session.controller.close()
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,366 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+
+import DG645
+import serial
+from cniAPI import IDENTIFY, CNIFrame, FrameError, make_connection, send_receive_cni
+from constants import CNI_GEARS, INIT_TIMEOUT, MINCURR
+from laser_state import LaserState, StatusPoller
+from vironAPI import LaserError, VironClient, login_command, parse_value
+
+LASERS = ("v1", "v2", "c1", "c2", "c3", "c4", "c5")
+TRIGGER_CODES = ("EE", "EI", "II")  # diode then QS; IE would be non-causal
+
+
+# set by initialize_all in each laser's task: status lines are collected there, not reported
+_collected = contextvars.ContextVar("collected", default=None)
+
+
+def nearest_gear(setting: float) -> int:
+    # gear id is 0,1,..,7
+    return min(range(len(CNI_GEARS)), key=lambda gear: abs(CNI_GEARS[gear] - setting))
+
+
+def not_initialized_handler(func) -> object:
+    @functools.wraps(func)
+    async def wrapper(self, l, *args, **kwargs):  # noqa: E741
+        resp = None
+        try:
+            if inspect.iscoroutinefunction(func):
+                resp = await func(self, l, *args, **kwargs)
+            else:
+                resp = func(self, l, *args, **kwargs)
+        except FrameError as e:  # the laser answered, but the reply was corrupt
+            resp = f"{l}: Rejected reply ({e}).\n"
+        except (KeyError, serial.SerialException):
+            self.on_not_initialized(l)
+            resp = f"{l}: Laser not initialized.\n"
+        if isinstance(resp, str):
+            self.status(resp)
+        return resp
+
+    return wrapper
+
+
+class LaserController:
+    """Headless control of the lasers, the DG645 and the PulseBlaster.
+
+    Every device method is a coroutine and has to run on one event loop: the
+    GUI's worker thread, or ``asyncio.run`` in a script. Nothing here imports
+    Qt. Progress and replies are reported as text through ``status``;
+    ``on_not_initialized(laser)`` is called when a command needs a link the
+    laser doesn't have, and ``on_update()`` after every status poll.
+    """
+
+    def __init__(
+        self, status=None, on_not_initialized=None, on_update=None,
+        dg645_ip=DG645.IP_ADDRESS, dg645_port=DG645.PORT,
+    ) -> None:
+        self.sink = status or (lambda resp: None)
+        self.on_not_initialized = on_not_initialized or (lambda laser: None)
+        self.lasers = {name: LaserState(name) for name in LASERS}
+        self.delay_gen = DG645.DG645(dg645_ip, dg645_port, status=self.sink)
+        self.poller = StatusPoller(self.lasers, status=self.sink, on_update=on_update)
+        self.pulse_blaster = None  # spinapi, once open_pulse_blaster has loaded it
+        self.programs = None  # pulse_program.ProgramLoader, alongside it
+
+    def status(self, resp: str) -> None:
+        lines = _collected.get()
+        if lines is None:
+            self.sink(resp)
+        else:
+            lines.append(resp)
+
+    async def start(self, poll: bool = True) -> None:  # noqa: FBT001
+        """Keep the DG645 link up in the background and (optionally) poll laser status."""
+        await self.delay_gen.start()
+        if poll:
+            await self.poller.start()
+
+    def configure(self, laser: str, host=None, port=None, mac=None) -> None:
+        state = self.lasers[laser]
+        if host is not None:
+            state.host = host
+        if port is not None:
+            state.port = port
+        if mac is not None:
+            state.mac = mac
+
+    # ---- lasers ----
+
+    async def connect(self, laser: str, com: str | None = None) -> str:
+        """Open the link (and log in) without changing what the laser is doing."""
+        state = self.lasers[laser]
+        status_text = ""
+        try:
+            if laser.startswith("v"):
+                if not state.connected:
+                    client = await VironClient.open(host=state.host, port=state.port)
+                    try:
+                        # the laser answers in order, so the login and queries go out together
+                        resp, maxcurr, qsdelay = await client.pipeline(
+                            [login_command(state.mac), "$MAXCURR ?\n", "$QSDELAY ?\n"],
+                        )
+                        status_text += f"{laser}: Initialized\n{laser}: {resp}\n"
+                        state.maxcurr = parse_value(maxcurr)
+                        state.qsdelay = parse_value(qsdelay) * 1000  # switch qsdelay to ns from us
+                    except BaseException:  # includes a cancelled init
+                        client.close()
+                        raise
+                    state.link = client
+                    status_text += f"{laser}: {maxcurr}\n"
+                    status_text += f"{laser}: {qsdelay}\n"
+            elif laser.startswith("c"):
+                if not state.connected:
+                    status_text += await self.connect_cni(laser, com)
+
+        except (OSError, ValueError, IndexError, serial.SerialException):  # no connection or reply
+            status_text += f"{laser}: Could not initialize (power off or wrong COM?)\n"
+        # not returned from a finally block so that a timeout can still cancel the init
+        return status_text
+
+    async def connect_cni(self, laser: str, com: str | None) -> str:
+        """Open ``com`` and keep it as the laser's link only if it answers IDENTIFY correctly."""
+        link = await make_connection(com)
+        try:
+            if link.is_open:
+                outstr = await send_receive_cni(link, bytearray(IDENTIFY))
+                if b"DPS" in outstr.payload:  # check if communicating correctly
+                    self.lasers[laser].link, link = link, None
+                    return f"{laser}: Initialized.\n"
+            raise serial.SerialException(f"No identify reply on {com}")
+        finally:
+            if link is not None:
+                link.close()
+
+    async def init_laser(self, laser: str, com: str | None = None) -> str:
+        """``connect``, and put a Viron in standby."""
+        state = self.lasers[laser]
+        status_text = await self.connect(laser, com)
+        if laser.startswith("v") and state.connected:
+            try:
+                resp = await state.link.send_receive("$STANDBY\n")
+            except OSError:
+                resp = "Could not connect to the laser"
+            state.firing = False
+            status_text += f"{laser}: {resp}\n"
+        return status_text
+
+    async def initialize(self, l, com, power, trig) -> str | None:  # noqa: E741
+        """``init_laser``, then set power and trigger; returns the trigger code, None if it failed."""
+        self.status(await self.init_laser(l, com))
+        if not self.lasers[l].connected:
+            return None
+        if power is not None:
+            await self.set_power(l, power)
+        return await self.set_trigger(l, trig)
+
+    async def initialize_all(self, jobs: dict) -> dict:
+        """Initialize ``{laser: (com, power, trig)}`` concurrently; returns ``{laser: trig}``.
+
+        Each laser's own status lines are held back and it gets one line:
+        initialized (and with which trigger), or why not.
+        """
+
+        async def timed(l, com, power, trig):  # noqa: E741
+            lines = []
+            _collected.set(lines)  # gather runs this in its own task, so only this laser's lines
+            try:
+                trig = await asyncio.wait_for(self.initialize(l, com, power, trig), INIT_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.sink(f"{l}: Initialization timed out after {INIT_TIMEOUT} s.\n")
+                return None
+            except OSError as e:
+                self.sink(f"{l}: Could not initialize ({e}).\n")
+                return None
+            if not self.lasers[l].connected:
+                text = "".join(lines).splitlines()
+                failed = [line for line in text if "Could not initialize" in line]
+                self.sink(f"{failed[-1]}\n" if failed else f"{l}: Could not initialize.\n")
+            elif trig is None:
+                self.sink(f"{l}: Initialized, but the trigger could not be set.\n")
+            else:
+                self.sink(f"{l}: Initialized, trigger {trig}.\n")
+            return trig
+
+        # each laser gets its own timeout so one dead device can't hold up the others
+        results = await asyncio.gather(*(timed(l, *job) for l, job in jobs.items()))
+        return dict(zip(jobs, results))
+
+    async def uninitialize(self, l) -> None:  # noqa: E741
+        state = self.lasers[l]
+        if l.startswith("v"):
+            await self.send_receive(l, "$STOP\n")
+        elif l.startswith("c") and state.connected:
+            state.link.close()
+            state.link = None
+        state.firing = False
+
+    async def enable(self, l, fire: bool) -> None:  # noqa: E741, FBT001
+        state = self.lasers[l]
+        if l.startswith("v"):
+            await self.send_receive(
+                l,
+                "$FIRE\n" if fire else "$STANDBY\n",
+            )
+            state.firing = fire and state.connected
+
+        elif l.startswith("c"):
+            data = bytearray([0x7F, 5, 0x21, fire, 0, 0, 0])
+            outstr = await self.send_receive(l, data)
+            if isinstance(outstr, CNIFrame):  # only do this if serialException is not raised
+                en = outstr.value
+                state.firing = bool(en)
+                self.status(f"{l}: {'Enabled' if en else 'Disabled'}.\n")
+        self.poller.wake()  # switch to the firing (or standby) poll rate right away
+
+    @not_initialized_handler  # in case maxcurr is not defined
+    async def set_power(self, l, power) -> str | None:  # noqa: E741
+        if l.startswith("v"):
+            return await self.send_receive(
+                l,
+                f"$DCURR {MINCURR + (self.lasers[l].require('maxcurr') - MINCURR) / 100 * power}\n",
+            )
+        if l.startswith("c"):
+            gear = nearest_gear(power)
+
+            data = bytearray([0x7F, 5, 0x23, gear, 0, 0, 0])
+
+            resp = ""
+            outstr = await self.send_receive(l, data)
+            if isinstance(outstr, CNIFrame):  # only do this if serialException is not raised
+                gear = outstr.value
+                resp = f"{l}: Power set to {CNI_GEARS[gear]}%.\n"
+
+            return resp
+        return None
+
+    async def set_trigger(self, l, trig: str) -> str | None:  # noqa: E741
+        if trig not in TRIGGER_CODES:
+            raise ValueError(f"Trigger code must be one of {', '.join(TRIGGER_CODES)}: {trig!r}")
+        if l.startswith("v"):
+            await self.send_receive(
+                l,
+                f"$TRIG {trig}\n",
+            )  # this will handle non-connected errors
+            if self.lasers[l].connected:
+                self.lasers[l].trig = trig
+                return trig
+
+        elif l.startswith("c"):
+            data = bytearray([0x7F, 5, 0x01, trig == "EE", 0, 0, 0])  # 0x01 external, 0x00 internal
+            outstr = await self.send_receive(l, data)
+
+            if isinstance(outstr, CNIFrame):  # only do this if serialException is not raised
+                int_trig = bool(outstr.value)
+                self.lasers[l].trig = "II" if not int_trig else "EE"
+
+                self.status(
+                    f"{l}: Trigger set to {'Internal' if not int_trig else 'External'}.\n",
+                )
+                return self.lasers[l].trig
+
+        return None
+
+    @not_initialized_handler
+    async def send_receive(self, laser: str, command: str | bytearray) -> str | CNIFrame:
+        if laser.startswith("v"):
+            try:
+                resp = await self.lasers[laser].require("link").send_receive(command)
+            except LaserError as e:
+                resp = str(e)
+            except OSError:  # timed out, or the connection dropped
+                resp = "Could not connect to the laser"
+            return f"{laser}: {resp}\n"
+        return await send_receive_cni(self.lasers[laser].require("link"), command)
+
+    # ---- DG645 ----
+
+    async def set_delays(self, delays: dict) -> DG645.SetResult:
+        """``{channel: seconds or (reference, seconds)}``, only changed channels are sent."""
+        result = await self.delay_gen.set_delays(delays)
+        self.status(result.message)
+        return result
+
+    async def get_delays(self, channels="ABCDEFGH") -> dict:
+        """``{channel: (reference, seconds)}`` as the DG645 has them now."""
+        names = {number: name for name, number in DG645.CHANNELS.items()}
+        delays = {}
+        for channel in channels:
+            resp = await self.delay_gen.query(f"DLAY?{DG645.CHANNELS[channel]}")
+            reference, delay = resp.split(",")
+            delays[channel] = (names[int(reference)], float(delay))
+        return delays
+
+    # ---- PulseBlaster ----
+
+    def open_pulse_blaster(
+        self, board: int = 0, clock: float = 500, simulate: bool = False,  # noqa: FBT001, FBT002
+    ) -> str:
+        """Load spinapi (and the SpinCore DLL) on first use and initialize ``board``.
+
+        With ``simulate`` a pb_simulator.SimulatedPulseBlaster stands in for the
+        board; it runs TTL pulse programs only, as ``run_pulse_program`` does.
+        """
+        if self.pulse_blaster is None:
+            import spinapi  # noqa: PLC0415 only needed when a PulseBlaster is used
+            from pulse_program import ProgramLoader  # noqa: PLC0415
+
+            if simulate:
+                from pb_simulator import SimulatedPulseBlaster  # noqa: PLC0415
+
+                spinapi = SimulatedPulseBlaster()
+            try:
+                spinapi.pb_count_boards()  # first call loads the DLL
+            except OSError as e:
+                return f"PulseBlaster: {e}\n"
+            self.pulse_blaster = spinapi
+            self.programs = ProgramLoader(spinapi)
+        pb = self.pulse_blaster
+        pb.pb_select_board(board)
+        self.programs.forget(board)
+        if pb.pb_init() != 0:
+            return f"PulseBlaster: Error initializing board {board}: {pb.pb_get_error()}\n"
+        pb.pb_core_clock(clock)
+        return f"PulseBlaster: board {board} ready at {clock} MHz.\n"
+
+    def start_pulse_blaster(self) -> None:
+        self.pulse_blaster.pb_reset()
+        self.pulse_blaster.pb_start()
+
+    def stop_pulse_blaster(self) -> None:
+        self.pulse_blaster.pb_stop()
+
+    def run_pulse_program(self, program, board: int = 0) -> str:
+        """Start ``program`` (a pulse_program.PulseProgram) on ``board``, uploading it only if needed."""
+        from pulse_program import PulseProgram  # noqa: PLC0415
+
+        if self.programs is None:
+            return "PulseBlaster: not opened, call open_pulse_blaster first.\n"
+        if not isinstance(program, PulseProgram):
+            return (
+                f"PulseBlaster: can't run a {type(program).__name__}, only TTL pulse programs"
+                " (pulse_program.PulseProgram); RF and acquisition programs aren't supported.\n"
+            )
+        try:
+            uploaded = self.programs.run(program, board)
+        except (RuntimeError, ValueError) as e:
+            return f"PulseBlaster: {e}\n"
+        how = "Uploaded and started" if uploaded else "Restarted"
+        return f"PulseBlaster: {how} the program on board {board}.\n"
+
+    # ---- shutdown ----
+
+    async def close(self) -> None:
+        await self.poller.close()
+        for state in self.lasers.values():
+            if state.connected:
+                state.link.close()
+                state.link = None
+        await self.delay_gen.close()
+        if self.pulse_blaster is not None:
+            self.pulse_blaster.pb_close()
+            self.pulse_blaster = None
+            self.programs = None
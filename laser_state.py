@@ -0,0 +1,130 @@
+import asyncio
+import time
+from dataclasses import dataclass
+
+import serial
+from cniAPI import IDENTIFY, send_receive_cni
+from constants import POLL_FIRING, POLL_STANDBY
+from periodic import Periodic
+from vironAPI import STATUS_QUERIES, parse_value
+
+POLL_ERRORS = (OSError, ValueError, IndexError, serial.SerialException)
+
+
+class NotInitializedError(KeyError):
+    """The laser has no open connection, or hasn't reported a value we need yet."""
+
+
+@dataclass
+class LaserState:
+    """Everything the app knows about one laser.
+
+    Connection settings and the open link are filled in by the GUI, the live
+    fields by ``StatusPoller``. Reading it never touches the device, so widgets
+    can refresh from it as often as they like.
+    """
+
+    name: str
+    host: str = ""
+    port: str = ""
+    mac: str = ""
+    link: object = None  # VironClient or CNITransport once initialized
+    trig: str = "EE"
+    maxcurr: float | None = None
+    qsdelay: float | None = None
+    firing: bool = False
+
+    # last polled values, None until the laser has answered
+    diode_temperature: float | None = None
+    laser_temperature: float | None = None
+    interlock: bool | None = None
+    shots: int | None = None
+    updated: float | None = None  # time.monotonic() of the last good poll
+    error: str = ""
+
+    @property
+    def is_viron(self) -> bool:
+        return self.name.startswith("v")
+
+    @property
+    def connected(self) -> bool:
+        return self.link is not None
+
+    def require(self, attr: str):
+        value = getattr(self, attr)
+        if value is None:
+            raise NotInitializedError(self.name)
+        return value
+
+    def summary(self) -> str:
+        if not self.connected:
+            return f"{self.name}: not initialized"
+        if self.updated is None:
+            return f"{self.name}: waiting for status"
+        lines = [f"{self.name}: {'firing' if self.firing else 'standby'}"]
+        if self.diode_temperature is not None:
+            lines.append(f"diode {self.diode_temperature:.1f} °C")
+        if self.laser_temperature is not None:
+            lines.append(f"laser {self.laser_temperature:.1f} °C")
+        if self.interlock is not None:
+            lines.append(f"interlock {'closed' if self.interlock else 'OPEN'}")
+        if self.shots is not None:
+            lines.append(f"{self.shots:,} shots")
+        lines.append(f"updated {time.monotonic() - self.updated:.0f} s ago")
+        if self.error:
+            lines.append(f"last poll failed: {self.error}")
+        return "\n".join(lines)
+
+
+class StatusPoller(Periodic):
+    """Background task that keeps every initialized laser's ``LaserState`` current.
+
+    All lasers are polled concurrently; a Viron's queries go out pipelined on
+    its client, a CNI gets the identify query as a heartbeat. The interval is
+    ``firing`` while any laser fires and ``standby`` otherwise, and ``wake``
+    cuts the current wait short (e.g. right after a fire command).
+    """
+
+    def __init__(self, lasers: dict, firing=POLL_FIRING, standby=POLL_STANDBY,
+                 status=None, on_update=None) -> None:
+        self.lasers = lasers
+        self.firing = firing
+        self.standby = standby
+        self.status = status or (lambda resp: None)
+        self.on_update = on_update or (lambda: None)
+
+    @property
+    def interval(self) -> float:
+        active = any(s.firing for s in self.lasers.values() if s.connected)
+        return self.firing if active else self.standby
+
+    async def poll(self) -> None:
+        states = [s for s in self.lasers.values() if s.connected]
+        if states:
+            await asyncio.gather(*(self._poll_laser(s) for s in states))
+            self.on_update()
+
+    async def step(self) -> float:
+        await self.poll()
+        return self.interval
+
+    async def _poll_laser(self, state: LaserState) -> None:
+        link = state.link
+        try:
+            if state.is_viron:
+                replies = await link.pipeline([f"${q} ?\n" for q, _ in STATUS_QUERIES.values()])
+                for (name, (_, kind)), reply in zip(STATUS_QUERIES.items(), replies):
+                    setattr(state, name, kind(parse_value(reply)))
+            else:
+                await send_receive_cni(link, bytearray(IDENTIFY))
+        except POLL_ERRORS as e:
+            if link is not state.link:  # uninitialized while the poll was out
+                return
+            if not state.error:  # only report the first failure, not every retry
+                self.status(f"{state.name}: Status poll failed ({e}).\n")
+            state.error = str(e) or type(e).__name__
+            return
+        if state.error:
+            self.status(f"{state.name}: Status poll recovered.\n")
+        state.error = ""
+        state.updated = time.monotonic()
@@ -565,6 +565,17 @@ class Ui_MainWindow(object):
         self.send_times.setCheckable(False)
         self.send_times.setChecked(False)
         self.send_times.setObjectName("send_times")
+        self.init_all = QtWidgets.QPushButton(parent=self.centralwidget)
+        self.init_all.setGeometry(QtCore.QRect(320, 10, 91, 24))
+        self.init_all.setCheckable(False)
+        self.init_all.setChecked(False)
+        self.init_all.setObjectName("init_all")
+        self.live_times = QtWidgets.QCheckBox(parent=self.centralwidget)
+        self.live_times.setGeometry(QtCore.QRect(420, 10, 51, 24))
+        self.live_times.setObjectName("live_times")
+        self.scan = QtWidgets.QPushButton(parent=self.centralwidget)
+        self.scan.setGeometry(QtCore.QRect(475, 10, 61, 24))
+        self.scan.setObjectName("scan")
         self.status = QtWidgets.QTextBrowser(parent=self.centralwidget)
         self.status.setGeometry(QtCore.QRect(790, 10, 200, 25))
         sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Policy.Minimum, QtWidgets.QSizePolicy.Policy.Minimum)
@@ -761,6 +772,10 @@ class Ui_MainWindow(object):
         self.label_6.setText(_translate("MainWindow", "QS trigger"))
         self.label.setText(_translate("MainWindow", "Overall timing (us)"))
         self.send_times.setText(_translate("MainWindow", "Set times"))
+        self.init_all.setText(_translate("MainWindow", "Initialize all"))
+        self.live_times.setToolTip(_translate("MainWindow", "Send timing changes to the DG645 as they are made"))
+        self.live_times.setText(_translate("MainWindow", "Live"))
+        self.scan.setText(_translate("MainWindow", "Scan…"))
         self.status.setPlaceholderText(_translate("MainWindow", "Status"))
         self.unlock_connections.setText(_translate("MainWindow", "Unlock connection settings"))
         self.load_settings.setText(_translate("MainWindow", "Load settings"))
@@ -0,0 +1,337 @@
+"""A PulseBlaster that only exists in Python, for working on pulse timing without a board.
+
+SimulatedPulseBlaster has spinapi's constants and the pb_* functions needed
+to program and run TTL pulse programs (pb_inst_pbonly, not the RF, DDS or
+acquisition calls), so anything that drives a board through those, like
+pulse_program.ProgramLoader or LaserController, can be handed one instead:
+
+    import pb_simulator
+    from pulse_program import PulseProgram, ProgramLoader
+
+    pb = pb_simulator.SimulatedPulseBlaster()
+    pb.pb_core_clock(500)
+    ProgramLoader(pb).run(program)
+    rises, falls = pb.timeline(until=1e6).edges(0)  # bit 0, in ns
+
+Programming checks what the board would refuse (instructions shorter than
+MIN_CYCLES at the pb_core_clock, counts out of range, bad opcodes) and
+returns -1 with the reason in pb_get_error, like the library. Running a
+program turns it into arrays of output flags and their start times. Loops
+whose body is plain CONTINUE/LONG_DELAY instructions are tiled with NumPy
+rather than stepped through, so a LOOP of a million shots simulates in
+milliseconds.
+"""
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+import spinapi
+from pulse_program import MAX_COUNT, MAX_CYCLES, MIN_CYCLES
+from spinapi import (
+    BRANCH,
+    CONTINUE,
+    END_LOOP,
+    JSR,
+    LONG_DELAY,
+    LOOP,
+    RTS,
+    STATUS_RESET,
+    STATUS_RUNNING,
+    STATUS_STOPPED,
+    STOP,
+    WAIT,
+)
+
+OPCODES = {CONTINUE, STOP, LOOP, END_LOOP, JSR, RTS, BRANCH, LONG_DELAY, WAIT}
+MAX_STEPS = 10**7  # instructions stepped through one by one before giving up on a run
+DEFAULT_CLOCK = 100  # MHz, until pb_core_clock says otherwise
+
+
+class SimulationError(RuntimeError):
+    pass
+
+
+@dataclass(slots=True)
+class Timeline:
+    """What the outputs did: ``flags[i]`` from ``starts[i]`` until the next start, in clock cycles.
+
+    ``end`` is where the run stopped (at a STOP, or the ``until`` it was asked
+    for) and ``waits`` are the cycles at which a WAIT held for its trigger;
+    the simulation triggers it straight away.
+    """
+
+    period: float  # ns per cycle
+    starts: np.ndarray
+    flags: np.ndarray
+    end: int
+    waits: np.ndarray
+    stopped: bool  # reached a STOP rather than ``until``
+
+    def level(self, bit: int) -> np.ndarray:
+        return (self.flags >> np.uint32(bit)) & np.uint32(1)
+
+    def edges(self, bit: int) -> tuple:
+        """Rising and falling edge times of flag ``bit``, in ns."""
+        level = self.level(bit).astype(np.int8)
+        change = np.diff(level, prepend=np.int8(0))
+        times = self.starts * self.period
+        return times[change == 1], times[change == -1]
+
+    def at(self, ns) -> np.ndarray:
+        """Output flags at the time(s) ``ns``."""
+        cycles = np.asarray(ns) / self.period
+        return self.flags[np.searchsorted(self.starts, cycles, side="right") - 1]
+
+
+@dataclass(slots=True)
+class _Board:
+    clock: float = DEFAULT_CLOCK
+    flags: list = field(default_factory=list)
+    opcodes: list = field(default_factory=list)
+    data: list = field(default_factory=list)
+    cycles: list = field(default_factory=list)
+    program: tuple | None = None  # (flags, opcodes, data, cycles) arrays once programmed
+    loops: dict = field(default_factory=dict)  # LOOP address -> its END_LOOP, for plain bodies
+    programming: bool = False
+    status: int = STATUS_RESET
+
+
+class SimulatedPulseBlaster:
+    """Stands in for the spinapi module: ``boards`` simulated boards, board 0 selected."""
+
+    Inst = spinapi.Inst
+
+    def __init__(self, boards: int = 1) -> None:
+        self.boards = [_Board() for _ in range(boards)]
+        self.board = self.boards[0]
+        self.error = ""
+
+    def _fail(self, message: str) -> int:
+        self.error = message
+        return -1
+
+    # ---- board ----
+
+    def pb_get_version(self) -> str:
+        return "simulated"
+
+    def pb_get_error(self) -> str:
+        return self.error
+
+    def pb_count_boards(self) -> int:
+        return len(self.boards)
+
+    def pb_select_board(self, board_number: int) -> int:
+        if not 0 <= board_number < len(self.boards):
+            return self._fail(f"Board {board_number} doesn't exist")
+        self.board = self.boards[board_number]
+        return 0
+
+    def pb_init(self) -> int:
+        self.board.status = STATUS_RESET
+        return 0
+
+    def pb_close(self) -> int:
+        return 0
+
+    def pb_set_debug(self, debug) -> int:
+        return 0
+
+    def pb_set_defaults(self) -> int:
+        return 0
+
+    def pb_core_clock(self, clock: float) -> None:
+        self.board.clock = clock
+
+    def pb_write_register(self, address, value) -> int:
+        return 0
+
+    def pb_get_firmware_id(self) -> int:
+        return 0
+
+    def pb_sleep_ms(self, mlsc) -> None:
+        pass  # nothing runs in real time here
+
+    def pb_read_status(self) -> int:
+        return self.board.status
+
+    def pb_status_message(self) -> str:
+        return {STATUS_STOPPED: "Stopped", STATUS_RESET: "Reset", STATUS_RUNNING: "Running"}.get(
+            self.board.status, "",
+        )
+
+    def pb_start(self) -> int:
+        if self.board.program is None:
+            return self._fail("No pulse program loaded")
+        self.board.status = STATUS_RUNNING
+        return 0
+
+    def pb_stop(self) -> int:
+        self.board.status = STATUS_STOPPED
+        return 0
+
+    def pb_reset(self) -> int:
+        self.board.status = STATUS_RESET
+        return 0
+
+    # ---- programming ----
+
+    def pb_start_programming(self, target) -> int:
+        if target != spinapi.PULSE_PROGRAM:
+            return self._fail(f"Only PULSE_PROGRAM is simulated, not target {target}")
+        board = self.board
+        board.flags, board.opcodes, board.data, board.cycles = [], [], [], []
+        board.program = None
+        board.programming = True
+        return 0
+
+    def pb_stop_programming(self) -> int:
+        board = self.board
+        if not board.programming:
+            return self._fail("pb_stop_programming without pb_start_programming")
+        board.programming = False
+        board.program = (
+            np.array(board.flags, dtype=np.uint32),
+            np.array(board.opcodes, dtype=np.int64),
+            np.array(board.data, dtype=np.int64),
+            np.array(board.cycles, dtype=np.int64),
+        )
+        board.loops = plain_loops(board.opcodes, board.data)
+        return 0
+
+    def pb_inst_pbonly(self, flags, inst, inst_data, length) -> int:
+        """Add an instruction (``length`` in ns) and return its address, or -1 if the board would refuse it."""
+        board = self.board
+        if not board.programming:
+            return self._fail("pb_inst_pbonly outside pb_start_programming/pb_stop_programming")
+        address = len(board.opcodes)
+        cycles = round(length * board.clock / 1e3)
+        if inst not in OPCODES:
+            return self._fail(f"Instruction {address}: unknown opcode {inst}")
+        if cycles < MIN_CYCLES:
+            return self._fail(
+                f"Instruction {address}: {length} ns is shorter than {MIN_CYCLES} cycles"
+                f" at {board.clock} MHz",
+            )
+        if cycles > MAX_CYCLES:
+            return self._fail(f"Instruction {address}: {length} ns is too long for one instruction")
+        if inst == LOOP and not 1 <= inst_data <= MAX_COUNT:
+            return self._fail(f"Instruction {address}: can't loop {inst_data} times")
+        if inst == LONG_DELAY and not 2 <= inst_data <= MAX_COUNT:
+            return self._fail(f"Instruction {address}: LONG_DELAY count {inst_data} out of range")
+        board.flags.append(flags & 0xFFFFFF)
+        board.opcodes.append(inst)
+        board.data.append(inst_data)
+        board.cycles.append(cycles)
+        return address
+
+    # ---- running ----
+
+    def timeline(self, board: int | None = None, until: float | None = None) -> Timeline:
+        """Run the program on ``board`` (the selected one by default) for ``until`` ns or to a STOP."""
+        b = self.board if board is None else self.boards[board]
+        if b.program is None:
+            raise SimulationError("No pulse program loaded")
+        period = 1e3 / b.clock
+        limit = None if until is None else round(until / period)
+        return run(b.program, b.loops, period, limit)
+
+
+# every constant spinapi has (PULSE_PROGRAM, ON, the opcodes, ...)
+for _name, _value in vars(spinapi).items():
+    if _name.isupper():
+        setattr(SimulatedPulseBlaster, _name, _value)
+del _name, _value
+
+
+def plain_loops(opcodes: list, data: list) -> dict:
+    """LOOP address -> END_LOOP address, for loops with only CONTINUE/LONG_DELAY in between."""
+    loops = {}
+    start = None
+    for address, op in enumerate(opcodes):
+        if op == LOOP:
+            start = address
+        elif op == END_LOOP and start is not None and data[address] == start:
+            loops[start] = address
+            start = None
+        elif op not in (CONTINUE, LONG_DELAY):
+            start = None
+    return loops
+
+
+def run(program: tuple, loops: dict, period: float, limit: int | None) -> Timeline:
+    """Step through ``program`` from address 0 until a STOP or ``limit`` cycles."""
+    flags, opcodes, data, cycles = program
+    lengths = np.where(opcodes == LONG_DELAY, cycles * data, cycles)  # a LONG_DELAY runs data times
+    flag_chunks, length_chunks = [], []
+    waits = []
+    counters = []  # [LOOP address, passes left]
+    returns = []  # JSR return addresses
+    t = 0
+    address = 0
+    steps = 0
+    stopped = False
+    size = len(opcodes)
+
+    while limit is None or t < limit:
+        if not 0 <= address < size:
+            raise SimulationError(f"Ran off the program at address {address}")
+        steps += 1
+        if steps > MAX_STEPS:
+            raise SimulationError(f"Still running after {MAX_STEPS} instructions; pass an until")
+        op = int(opcodes[address])
+
+        if op == STOP:
+            flag_chunks.append(flags[address : address + 1])  # the outputs hold the STOP's flags
+            length_chunks.append(np.zeros(1, dtype=np.int64))
+            stopped = True
+            break
+
+        if op == LOOP and address in loops and not (counters and counters[-1][0] == address):
+            end = loops[address]
+            count = int(data[address])
+            body = slice(address, end + 1)
+            flag_chunks.append(np.tile(flags[body], count))
+            length_chunks.append(np.tile(lengths[body], count))
+            t += int(lengths[body].sum()) * count
+            address = end + 1
+            continue
+
+        flag_chunks.append(flags[address : address + 1])
+        length_chunks.append(lengths[address : address + 1])
+        if op == WAIT:
+            waits.append(t)
+        t += int(lengths[address])
+
+        if op == LOOP:
+            if not (counters and counters[-1][0] == address):
+                counters.append([address, int(data[address])])
+            address += 1
+        elif op == END_LOOP:
+            if not counters or counters[-1][0] != data[address]:
+                raise SimulationError(f"END_LOOP at {address} doesn't close the open loop")
+            counters[-1][1] -= 1
+            if counters[-1][1] > 0:
+                address = int(data[address])
+            else:
+                counters.pop()
+                address += 1
+        elif op == JSR:
+            returns.append(address + 1)
+            address = int(data[address])
+        elif op == RTS:
+            if not returns:
+                raise SimulationError(f"RTS at {address} without a JSR")
+            address = returns.pop()
+        elif op == BRANCH:
+            address = int(data[address])
+        else:  # CONTINUE, LONG_DELAY, WAIT
+            address += 1
+
+    lengths = np.concatenate(length_chunks) if length_chunks else np.zeros(0, dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(lengths) else lengths
+    out = np.concatenate(flag_chunks) if flag_chunks else np.zeros(0, dtype=np.uint32)
+    end = t if limit is None else min(t, limit)
+    keep = starts < end if not stopped else np.ones(len(starts), dtype=bool)
+    return Timeline(period, starts[keep], out[keep], end, np.array(waits, dtype=np.int64), stopped)
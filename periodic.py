@@ -0,0 +1,43 @@
+import asyncio
+
+
+class Periodic:
+    """Base for objects that repeat ``step`` in a background task.
+
+    ``step`` returns how many seconds to wait before it runs again; ``wake``
+    cuts that wait short. ``start`` launches the task (again, if it ended)
+    and ``close`` cancels it.
+    """
+
+    _task = None
+    _wake = None
+
+    async def step(self) -> float:
+        raise NotImplementedError
+
+    async def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def wake(self) -> None:
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            delay = await self.step()
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
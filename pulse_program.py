@@ -0,0 +1,447 @@
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import spinapi
+from spinapi import BRANCH, CONTINUE, END_LOOP, LONG_DELAY, LOOP, STOP, WAIT
+
+MIN_CYCLES = 5  # shortest instruction the board runs, in clock periods
+MAX_CYCLES = 2**32 - 1  # longest a single instruction can count
+MAX_COUNT = 2**20  # largest LOOP / LONG_DELAY count (20-bit data field)
+LONG_UNIT = MAX_CYCLES - MIN_CYCLES  # LONG_DELAY step, leaves room for a remainder >= MIN_CYCLES
+
+
+@dataclass(slots=True)
+class Instruction:
+    flags: int
+    opcode: int
+    data: int
+    cycles: int  # length in clock periods
+
+
+@dataclass(slots=True)
+class Sequence:
+    """``duration`` ns of time with pulses on named channels placed in it."""
+
+    duration: float
+    pulses: list = field(default_factory=list)  # (channel, start, stop) in ns
+
+    def pulse(self, channel: str, start: float, width: float) -> "Sequence":
+        if width <= 0 or start < 0 or start + width > self.duration:
+            raise ValueError(
+                f"Pulse on {channel} ({start} + {width} ns) doesn't fit in {self.duration} ns",
+            )
+        self.pulses.append((channel, start, start + width))
+        return self
+
+
+@dataclass(slots=True)
+class Repeat:
+    count: int
+    items: list
+
+
+@dataclass(slots=True)
+class Wait:
+    pass
+
+
+@dataclass(slots=True)
+class Label:
+    name: str
+
+
+@dataclass(slots=True)
+class Branch:
+    label: str | None  # None jumps to the start
+
+
+@dataclass(slots=True)
+class Stop:
+    pass
+
+
+class PulseProgram:
+    """A PulseBlaster program built from named channels and pulses in ns.
+
+    ``channels`` maps names to flag bits (a list numbers them from bit 0);
+    ``flags`` are set in every instruction, e.g. ``spinapi.ON`` for the
+    short-pulse bits of an ESR-PRO. ``compile`` turns the program into as few
+    instructions as it can: equal-flag stretches are merged, identical
+    back-to-back sequences become one LOOP, and waits longer than one
+    instruction can count use LONG_DELAY.
+
+        program = PulseProgram(["qs", "fel_gate", "digitizer"], clock=500)
+        program.wait()  # for the hardware trigger
+        shot = Sequence(1e6).pulse("qs", 0, 50).pulse("digitizer", 200, 100)
+        program.repeat(1000, shot)
+        program.branch()  # back to the wait
+        program.upload()
+    """
+
+    def __init__(self, channels, clock: float = 500, flags: int = 0) -> None:
+        if isinstance(channels, dict):
+            self.channels = dict(channels)
+        else:
+            self.channels = {name: bit for bit, name in enumerate(channels)}
+        self.clock = clock  # MHz
+        self.flags = flags
+        self.items = []
+
+    @property
+    def period(self) -> float:
+        return 1e3 / self.clock  # ns
+
+    def sequence(self, duration: float) -> Sequence:
+        """A new sequence appended to the program, to place pulses in."""
+        seq = Sequence(duration)
+        self.items.append(seq)
+        return seq
+
+    def add(self, *items) -> "PulseProgram":
+        self.items.extend(items)
+        return self
+
+    def delay(self, duration: float) -> "PulseProgram":
+        return self.add(Sequence(duration))
+
+    def repeat(self, count: int, *items) -> "PulseProgram":
+        return self.add(Repeat(count, list(items)))
+
+    def wait(self) -> "PulseProgram":
+        """Hold until the board is triggered, then go on with what follows."""
+        return self.add(Wait())
+
+    def label(self, name: str) -> "PulseProgram":
+        return self.add(Label(name))
+
+    def branch(self, label: str | None = None) -> "PulseProgram":
+        return self.add(Branch(label))
+
+    def stop(self) -> "PulseProgram":
+        return self.add(Stop())
+
+    def compile(self) -> list:
+        return _Compiler(self).run(self.items)
+
+    def key(self) -> str:
+        """Digest of everything that goes into ``compile``, to cache compiled programs by."""
+        text = repr((sorted(self.channels.items()), self.clock, self.flags, self.items))
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def upload(self, pb=None) -> int:
+        """Program the selected board with ``pb_inst_pbonly`` in one pass; returns the length."""
+        instructions = self.compile()
+        upload(instructions, self.period, pb)
+        return len(instructions)
+
+
+def upload(instructions: list, period: float, pb=None) -> None:
+    """Send ``instructions`` (``period`` ns per cycle) to the selected board in one pass."""
+    if pb is None:
+        pb = spinapi
+    inst = pb.pb_inst_pbonly
+    pb.pb_start_programming(pb.PULSE_PROGRAM)
+    try:
+        for n, i in enumerate(instructions):
+            if inst(i.flags, i.opcode, i.data, i.cycles * period) < 0:
+                raise RuntimeError(f"PulseBlaster rejected instruction {n}: {pb.pb_get_error()}")
+    finally:
+        pb.pb_stop_programming()
+
+
+def digest(instructions: list, period: float) -> str:
+    """Names what a board would hold after ``upload``: same digest, same program."""
+    h = hashlib.blake2b(repr(period).encode(), digest_size=16)
+    for i in instructions:
+        h.update(b"%d,%d,%d,%d;" % (i.flags, i.opcode, i.data, i.cycles))
+    return h.hexdigest()
+
+
+class ProgramLoader:
+    """Runs PulsePrograms on boards, uploading only when a board holds something else.
+
+    The digest of what was last uploaded to each board is remembered, so
+    starting the same program again is just ``pb_reset``/``pb_start``. The
+    ``cache_size`` most recently used programs stay compiled, so switching
+    between a few experiment sequences doesn't recompile them either.
+    """
+
+    def __init__(self, pb=None, cache_size: int = 16) -> None:
+        self.pb = pb
+        self.cache_size = cache_size
+        self.compiled = OrderedDict()  # program key -> (digest, instructions, period)
+        self.loaded = {}  # board -> digest of the program on it
+
+    def compile(self, program: PulseProgram) -> tuple:
+        key = program.key()
+        try:
+            self.compiled.move_to_end(key)
+            return self.compiled[key]
+        except KeyError:
+            pass
+        instructions = program.compile()
+        entry = (digest(instructions, program.period), instructions, program.period)
+        self.compiled[key] = entry
+        if len(self.compiled) > self.cache_size:
+            self.compiled.popitem(last=False)
+        return entry
+
+    def load(self, program: PulseProgram, board: int = 0) -> bool:
+        """Make ``board`` hold ``program``; True if that took an upload."""
+        pb = self._pb()
+        code, instructions, period = self.compile(program)
+        pb.pb_select_board(board)
+        if self.loaded.get(board) == code:
+            return False
+        self.loaded.pop(board, None)  # unknown if the upload fails partway
+        upload(instructions, period, pb)
+        self.loaded[board] = code
+        return True
+
+    def run(self, program: PulseProgram, board: int = 0) -> bool:
+        """``load`` and then restart ``board`` from the top; True if it was uploaded."""
+        uploaded = self.load(program, board)
+        pb = self._pb()
+        pb.pb_reset()
+        pb.pb_start()
+        return uploaded
+
+    def forget(self, board: int | None = None) -> None:
+        """Stop trusting what ``board`` (every board if None) holds, e.g. after ``pb_init``."""
+        if board is None:
+            self.loaded.clear()
+        else:
+            self.loaded.pop(board, None)
+
+    def _pb(self):
+        if self.pb is None:
+            self.pb = spinapi
+        return self.pb
+
+
+def collapse(items: list) -> list:
+    """Fold runs of identical items into ``Repeat``s."""
+    out = []
+    for item in items:
+        if isinstance(item, Repeat):
+            item = Repeat(item.count, collapse(item.items))
+        last = out[-1] if out else None
+        if isinstance(item, Sequence | Repeat) and last is not None:
+            if last == item:
+                out[-1] = Repeat(2, [item])
+                continue
+            if isinstance(last, Repeat) and last.items == [item]:
+                last.count += 1
+                continue
+        out.append(item)
+    return out
+
+
+def unroll_edges(items: list) -> list:
+    """A loop body with nested repeats at either end peeled off once.
+
+    A LOOP and its END_LOOP have to sit on the body's own first and last
+    instructions, which a nested loop there would already be using.
+    """
+    items = list(items)
+    while items and isinstance(items[0], Repeat):
+        first, rest = peel(items.pop(0))
+        items = [*first, *rest, *items]
+    while items and isinstance(items[-1], Repeat):
+        last, rest = peel(items.pop())
+        items = [*items, *rest, *last]
+    return items
+
+
+def peel(inner: Repeat) -> tuple:
+    """``inner`` split into one copy of its items and what's left of the repeat."""
+    if inner.count < 1:
+        return [], []
+    if inner.count == 1:
+        return list(inner.items), []
+    rest = [Repeat(inner.count - 1, inner.items)] if inner.count > 2 else list(inner.items)
+    return list(inner.items), rest
+
+
+class _Compiler:
+    def __init__(self, program: PulseProgram) -> None:
+        self.program = program
+        self.out = []
+        self.labels = {}
+        self.branches = []  # (instruction index, label)
+        self.pending = []  # [flags, cycles] stretches not yet turned into instructions
+        self.head = []  # (opcode, data) the next instructions have to carry (LOOP, WAIT)
+
+    def run(self, items: list) -> list:
+        self.items(collapse(items))
+        self.flush()
+        if self.head or not self.out or self.out[-1].opcode not in (STOP, BRANCH):
+            self.flush(STOP)
+        for index, label in self.branches:
+            if label is not None and label not in self.labels:
+                raise ValueError(f"Branch to unknown label {label!r}")
+            self.out[index].data = self.labels.get(label, 0)
+        return self.out
+
+    def items(self, items: list) -> None:
+        for item in items:
+            if isinstance(item, Sequence):
+                for flags, cycles in self.intervals(item):
+                    self.append(flags, cycles)
+            elif isinstance(item, Repeat):
+                self.repeat(item.count, item.items)
+            elif isinstance(item, Wait):
+                self.flush()
+                self.head.append((WAIT, 0))
+            elif isinstance(item, Label):
+                self.flush()
+                self.labels[item.name] = len(self.out)  # a pending WAIT/LOOP lands here too
+            elif isinstance(item, Branch):
+                self.flush(BRANCH)
+                self.branches.append((len(self.out) - 1, item.label))
+            elif isinstance(item, Stop):
+                self.flush()
+                self.flush(STOP)
+            else:
+                raise TypeError(f"Can't compile {item!r}")
+
+    def intervals(self, seq: Sequence) -> list:
+        period = self.program.period
+        changes = []  # (cycle, bit, +1 on / -1 off)
+        for channel, start, stop in seq.pulses:
+            try:
+                bit = 1 << self.program.channels[channel]
+            except KeyError:
+                raise ValueError(f"Unknown channel {channel!r}") from None
+            changes.append((self.cycles(start, period), bit, 1))
+            changes.append((self.cycles(stop, period), bit, -1))
+        changes.sort(key=lambda change: change[0])
+        times = sorted({0, self.cycles(seq.duration, period), *(c[0] for c in changes)})
+
+        active = {}  # bit -> overlapping pulses on it
+        intervals = []
+        i = 0
+        for start, stop in zip(times, times[1:]):
+            while i < len(changes) and changes[i][0] <= start:
+                _, bit, step = changes[i]
+                active[bit] = active.get(bit, 0) + step
+                i += 1
+            flags = self.program.flags
+            for bit, n in active.items():
+                if n > 0:
+                    flags |= bit
+            intervals.append((flags, stop - start))
+        return intervals
+
+    @staticmethod
+    def cycles(ns: float, period: float) -> int:
+        return round(ns / period)
+
+    def append(self, flags: int, cycles: int) -> None:
+        if cycles <= 0:
+            return
+        if self.pending and self.pending[-1][0] == flags:
+            self.pending[-1][1] += cycles
+        else:
+            self.pending.append([flags, cycles])
+
+    def flat(self, items: list) -> list | None:
+        """The stretches of ``items`` if it's nothing but sequences, else None."""
+        saved, self.pending = self.pending, []
+        try:
+            for item in items:
+                if isinstance(item, Sequence):
+                    for flags, cycles in self.intervals(item):
+                        self.append(flags, cycles)
+                elif isinstance(item, Repeat):
+                    inner = self.flat(item.items)
+                    if inner is None or len(inner) != 1:
+                        return None
+                    self.append(inner[0][0], inner[0][1] * item.count)
+                else:
+                    return None
+            return self.pending
+        finally:
+            self.pending = saved
+
+    def repeat(self, count: int, items: list) -> None:
+        if count < 1:
+            return
+        stretches = self.flat(items)
+        if stretches is not None and len(stretches) <= 1:
+            for flags, cycles in stretches:  # one stretch repeated is just a longer one
+                self.append(flags, cycles * count)
+            return
+        if count == 1:
+            self.items(items)
+            return
+        if count > MAX_COUNT:
+            raise ValueError(f"Can't loop {count} times, the board counts to {MAX_COUNT}")
+        self.flush()
+        if self.head:  # a pending WAIT can't share the LOOP's instruction, so the first pass goes before it
+            self.items(items)
+            self.repeat(count - 1, items)
+            return
+        start = len(self.out)  # where the LOOP instruction will land
+        self.head.append((LOOP, count))
+        self.items(unroll_edges(items))
+        self.flush(END_LOOP, start)
+
+    def flush(self, last_op: int | None = None, last_data: int = 0) -> None:
+        run, self.pending = self.pending, []
+        if not run and last_op is None:
+            return  # anything in head waits for the next stretch
+        head, self.head = self.head, []
+        base = self.program.flags
+
+        # an opcode needs an instruction of its own, not one of a LONG_DELAY's
+        if run and run[0][1] > MAX_CYCLES and head:
+            half = MAX_CYCLES // 2
+            run[0:1] = [[run[0][0], half], [run[0][0], run[0][1] - half]]
+        if run and run[-1][1] > MAX_CYCLES and last_op is not None:
+            half = MAX_CYCLES // 2
+            run[-1:] = [[run[-1][0], run[-1][1] - half], [run[-1][0], half]]
+
+        out = []
+        for flags, cycles in run:
+            out.extend(self.pieces(flags, cycles))
+
+        # only an opcode with nothing to run after it (a WAIT right before a STOP) needs a filler
+        while len(head) > 1 or (head and not out):
+            opcode, data = head.pop(0)
+            self.out.append(Instruction(base, opcode, data, MIN_CYCLES))
+        if head:
+            out[0].opcode, out[0].data = head[0]
+
+        if last_op is not None:
+            if out and out[-1].opcode == CONTINUE:
+                out[-1].opcode, out[-1].data = last_op, last_data
+            elif out and out[-1].cycles >= 2 * MIN_CYCLES:
+                last = out[-1]
+                half = last.cycles // 2
+                last.cycles -= half
+                out.append(Instruction(last.flags, last_op, last_data, half))
+            else:
+                flags = out[-1].flags if out else base
+                out.append(Instruction(flags, last_op, last_data, MIN_CYCLES))
+        self.out.extend(out)
+
+    @staticmethod
+    def pieces(flags: int, cycles: int) -> list:
+        if cycles < MIN_CYCLES:
+            raise ValueError(
+                f"A {cycles}-cycle stretch is shorter than the board's {MIN_CYCLES}-cycle minimum",
+            )
+        if cycles <= MAX_CYCLES:
+            return [Instruction(flags, CONTINUE, 0, cycles)]
+        count, rest = divmod(cycles, LONG_UNIT)
+        if rest < MIN_CYCLES:
+            count, rest = count - 1, rest + LONG_UNIT
+        if count > MAX_COUNT:
+            raise ValueError(f"{cycles} cycles is longer than one LONG_DELAY can wait")
+        if count > 1:
+            first = Instruction(flags, LONG_DELAY, count, LONG_UNIT)
+        else:
+            first = Instruction(flags, CONTINUE, 0, LONG_UNIT)
+        return [first, Instruction(flags, CONTINUE, 0, rest)]
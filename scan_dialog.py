@@ -0,0 +1,133 @@
+from delay_scan import LASER_CHANNELS, DelayScan, default_reference
+from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtWidgets import (
+    QComboBox,
+    QDialog,
+    QDoubleSpinBox,
+    QFormLayout,
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+)
+
+
+def ns_box(value: float) -> QDoubleSpinBox:
+    box = QDoubleSpinBox()
+    box.setDecimals(3)
+    box.setRange(-1e8, 1e8)
+    box.setSuffix(" ns")
+    box.setValue(value)
+    return box
+
+
+class ScanDialog(QDialog):
+    """Non-modal window that runs a DelayScan on the GUI's DG645 link."""
+
+    # scan steps are confirmed on the worker thread, so progress comes back as a signal
+    progress = pyqtSignal(int, float)
+
+    def __init__(self, gui) -> None:
+        super().__init__(gui)
+        self.gui = gui
+        self.scan = None
+        self.setWindowTitle("Delay scan")
+
+        self.channel = QComboBox()
+        self.channel.addItems(list("ABCDEFGH") + list(LASER_CHANNELS))
+        self.start_ns = ns_box(0)
+        self.stop_ns = ns_box(1000)
+        self.step_ns = ns_box(10)
+        self.dwell_ms = QDoubleSpinBox()
+        self.dwell_ms.setRange(0, 1e6)
+        self.dwell_ms.setSuffix(" ms")
+        self.dwell_ms.setValue(100)
+        self.reference = QLabel()
+        self.channel.currentTextChanged.connect(self.show_reference)
+        self.show_reference(self.channel.currentText())
+        self.state = QLabel("Idle")
+
+        self.start_button = QPushButton("Start")
+        self.start_button.clicked.connect(self.start)
+        self.pause_button = QPushButton("Pause")
+        self.pause_button.clicked.connect(self.pause)
+        self.abort_button = QPushButton("Abort")
+        self.abort_button.clicked.connect(self.abort)
+        buttons = QHBoxLayout()
+        for button in (self.start_button, self.pause_button, self.abort_button):
+            buttons.addWidget(button)
+
+        form = QFormLayout(self)
+        form.addRow("Channel", self.channel)
+        form.addRow("After", self.reference)
+        form.addRow("Start", self.start_ns)
+        form.addRow("Stop", self.stop_ns)
+        form.addRow("Step", self.step_ns)
+        form.addRow("Dwell", self.dwell_ms)
+        form.addRow(buttons)
+        form.addRow(self.state)
+
+        self.progress.connect(self.show_progress)
+        self.set_running(False)
+
+    def show_reference(self, channel: str) -> None:
+        reference = default_reference(channel)
+        if reference == "T0":
+            self.reference.setText("T0")
+        else:  # a linked channel, scanned as its offset so the link is kept
+            self.reference.setText(f"{reference} (offset from {reference}, linked)")
+
+    def set_running(self, running: bool) -> None:  # noqa: FBT001
+        self.start_button.setEnabled(not running)
+        self.pause_button.setEnabled(running)
+        self.abort_button.setEnabled(running)
+        self.pause_button.setText("Pause")
+
+    def start(self) -> None:
+        try:
+            self.scan = DelayScan.from_range(
+                self.gui.delay_gen,
+                self.channel.currentText(),
+                self.start_ns.value() * 1e-9,  # ns -> s
+                self.stop_ns.value() * 1e-9,
+                self.step_ns.value() * 1e-9,
+                reference=default_reference(self.channel.currentText()),
+                dwell=self.dwell_ms.value() * 1e-3,
+                on_step=lambda step: self.progress.emit(step.index, step.delay),
+            )
+        except ValueError as e:
+            self.state.setText(str(e))
+            return
+        self.set_running(True)
+        self.state.setText(f"Scanning {self.scan.channel}, {len(self.scan.delays)} steps")
+        self.gui.worker.submit(self.scan.run(), self.finished)
+
+    def pause(self) -> None:
+        # the scan lives on the worker loop, so its controls are called there
+        paused = self.pause_button.text() == "Pause"
+        self.gui.worker.loop.call_soon_threadsafe(self.scan.pause if paused else self.scan.resume)
+        self.pause_button.setText("Resume" if paused else "Pause")
+
+    def abort(self) -> None:
+        if self.scan is not None:
+            self.gui.worker.loop.call_soon_threadsafe(self.scan.abort)
+
+    def show_progress(self, index: int, delay: float) -> None:
+        self.state.setText(f"Step {index + 1}/{len(self.scan.delays)}: {delay * 1e9:.3f} ns")
+
+    def finished(self, result) -> None:
+        self.set_running(False)
+        if isinstance(result, Exception):
+            resp = f"Delay scan failed: {result}"
+        else:
+            done = sum(step.confirmed is not None for step in result)
+            resp = f"Delay scan on {self.scan.channel}: {done}/{len(self.scan.delays)} steps"
+            if self.scan.error is not None:
+                resp += f", stopped by DG645 error at {self.scan.error}"
+            elif self.scan.aborted:
+                resp += ", aborted"
+        self.state.setText(resp)
+        self.gui.status_update(resp + ".\n")
+
+    def closeEvent(self, event) -> None:  # noqa: N802 Qt override
+        self.abort()
+        super().closeEvent(event)
@@ -0,0 +1,97 @@
+import asyncio
+from dataclasses import dataclass
+
+from constants import PORT_SCAN
+from periodic import Periodic
+
+
+@dataclass(frozen=True, slots=True)
+class SerialPort:
+    device: str  # what gets opened, e.g. COM7 or /dev/ttyUSB0
+    description: str = ""
+    serial_number: str | None = None
+    vid: int | None = None
+    pid: int | None = None
+
+    @property
+    def hardware_id(self) -> str:
+        """Names the adapter rather than the port: its serial number, else VID:PID ("" if neither).
+
+        Windows hands out a new COM number when an adapter moves to another
+        USB socket, so lasers are matched to adapters by this instead.
+        """
+        if self.serial_number:
+            return f"SER={self.serial_number}"
+        if self.vid is not None and self.pid is not None:
+            return f"{self.vid:04X}:{self.pid:04X}"
+        return ""
+
+    def tooltip(self) -> str:
+        return "\n".join(filter(None, [self.description, self.hardware_id]))
+
+
+def list_ports() -> list:
+    """One scan of the serial ports. Blocking (slow on Windows), so run it off the GUI thread."""
+    # imported here so startup doesn't pay for it
+    from serial.tools.list_ports import comports  # noqa: PLC0415
+
+    return [
+        SerialPort(
+            port.device.split("-")[0].strip(), port.description, port.serial_number,
+            port.vid, port.pid,
+        )
+        for port in comports()
+    ]
+
+
+def find_port(ports, hardware_id: str) -> str | None:
+    """Device of the one port whose adapter is ``hardware_id``; None if it's absent or ambiguous.
+
+    Identical adapters without serial numbers share a VID:PID, and then there
+    is no telling which laser is which.
+    """
+    if not hardware_id:
+        return None
+    matches = [port.device for port in ports if port.hardware_id == hardware_id]
+    return matches[0] if len(matches) == 1 else None
+
+
+class PortWatcher(Periodic):
+    """Background task that keeps one shared list of the serial ports current.
+
+    The ports are rescanned every ``interval`` seconds and ``on_change`` gets
+    the new list only when a port appeared or went away, so every consumer
+    sees the same scan and adapters plugged in later show up without a
+    restart. ``rescan`` forces a scan now.
+    """
+
+    def __init__(self, interval=PORT_SCAN, status=None, on_change=None) -> None:
+        self.interval = interval
+        self.status = status or (lambda resp: None)
+        self.on_change = on_change or (lambda ports: None)
+        self.ports = []
+        self.error = ""
+        self.scanned = False
+
+    def rescan(self) -> None:
+        self.wake()
+
+    async def scan(self) -> list:
+        try:
+            ports = await asyncio.to_thread(list_ports)
+        except OSError as e:
+            if not self.error:  # a failure is reported once, until a scan works again
+                self.status(f"Could not list the COM ports ({e}).\n")
+            self.error = str(e) or type(e).__name__
+            return self.ports
+        self.error = ""
+        # the first scan always reports, even with no ports, so placeholders get replaced
+        if not self.scanned or set(ports) != set(self.ports):
+            self.ports = ports
+            self.scanned = True
+            self.on_change(ports)
+        return ports
+
+    async def step(self) -> float:
+        await self.scan()
+        return self.interval
@@ -20,18 +20,48 @@
 # Version 20230707
 
 import ctypes
+import functools
 
 PULSE_PROGRAM = 0
 FREQ_REGS = 1  
    
-try:
-	spinapi = ctypes.CDLL("spinapi64")
-except:
-	try:
-		spinapi = ctypes.CDLL("spinapi")
-	except:
-		print("Failed to load spinapi library.")
-		pass
+class _Library:
+	"""The SpinCore library, loaded (and its prototypes set) on first use.
+
+	Importing this module doesn't need the DLL, so code that only might drive a
+	PulseBlaster can import it freely. With ``typed=False`` the functions come
+	without argtypes (see ``_raw``).
+	"""
+
+	def __init__(self, typed=True):
+		self._typed = typed
+
+	def __getattr__(self, name):
+		dll = _load()
+		if self._typed:
+			func = getattr(dll, name)
+		else:  # a second handle on the symbol, the typed one keeps its argtypes
+			func = dll._FuncPtr((name, dll))
+			func.restype = PROTOTYPES[name][0]
+		setattr(self, name, func)  # later calls find it directly, without coming through here
+		return func
+
+@functools.cache
+def _load():
+	for name in ("spinapi64", "spinapi"):
+		try:
+			dll = ctypes.CDLL(name)
+		except OSError:
+			continue
+		_set_prototypes(dll)
+		return dll
+	raise OSError("Failed to load spinapi library.")
+
+spinapi = _Library()
+# Programming a board is one pb_inst_* call per instruction, and ctypes' argtypes
+# conversion costs more than the call itself. Those wrappers call these untyped
+# handles instead and wrap the length themselves; ints go over as C int either way.
+_raw = _Library(typed=False)
 	
 def enum(**enums):
     return type('Enum', (), enums)
@@ -134,233 +164,133 @@ RAM_DIRECT = 0x8000 | BYPASS_CIC | BYPASS_FIR | BYPASS_MULT
 
 
 
-spinapi.pb_get_version.restype = (ctypes.c_char_p)
-spinapi.pb_get_error.restype = (ctypes.c_char_p)
-
-spinapi.pb_count_boards.restype = (ctypes.c_int)
-
-spinapi.pb_init.restype = (ctypes.c_int)
-
-spinapi.pb_select_board.argtype = (ctypes.c_int)
-spinapi.pb_select_board.restype = (ctypes.c_int)
-
-spinapi.pb_set_debug.argtype = (ctypes.c_int)
-spinapi.pb_set_debug.restype = (ctypes.c_int)
-
-spinapi.pb_set_defaults.restype = (ctypes.c_int)
-
-spinapi.pb_set_freq.argtype = (ctypes.c_double)
-spinapi.pb_set_freq.restype = (ctypes.c_int)
-
-spinapi.pb_set_phase.argtype = (ctypes.c_double)
-spinapi.pb_set_phase.restype = (ctypes.c_int)
-
-spinapi.pb_set_amp.argtype = (ctypes.c_float, ctypes.c_int)
-spinapi.pb_set_amp.restype = (ctypes.c_int)
-
-spinapi.pb_overflow.argtype = (ctypes.c_int, ctypes.c_int)
-spinapi.pb_overflow.restype = (ctypes.c_int)
-
-spinapi.pb_scan_count.argtype = (ctypes.c_int)
-spinapi.pb_scan_count.restype = (ctypes.c_int)
-
-spinapi.pb_set_num_points.argtype = (ctypes.c_int)
-spinapi.pb_set_num_points.restype = (ctypes.c_int)
-
-spinapi.pb_set_radio_control.argtype = (ctypes.c_int)
-spinapi.pb_set_radio_control.restype = (ctypes.c_int)
-
-spinapi.pb_core_clock.argtype = (ctypes.c_double)
-spinapi.pb_core_clock.restype = (ctypes.c_int)
-
-spinapi.pb_write_register.argtype = (ctypes.c_int, ctypes.c_int)
-spinapi.pb_write_register.restype = (ctypes.c_int)
-
-spinapi.pb_start_programming.argtype = (ctypes.c_int)
-spinapi.pb_start_programming.restype = (ctypes.c_int)
-
-spinapi.pb_stop_programming.restype = (ctypes.c_int)
-
-spinapi.pb_start.restype = (ctypes.c_int)
-
-spinapi.pb_stop.restype = (ctypes.c_int)
-
-spinapi.pb_reset.restype = (ctypes.c_int)
-
-spinapi.pb_close.restype = (ctypes.c_int)
-
-spinapi.pb_read_status.restype = (ctypes.c_int)
-
-spinapi.pb_status_message.restype = (ctypes.c_char_p)
-
-spinapi.pb_get_firmware_id.restype = (ctypes.c_int)
-
-spinapi.pb_sleep_ms.argtype = (ctypes.c_int)
-spinapi.pb_sleep_ms.restype = (ctypes.c_int)                        
-
-spinapi.pb_get_data.argtype = (
-    ctypes.c_int, #num_points Number of complex points to read from RAM
-    ctypes.POINTER(ctypes.c_int), #real_data Real data from RAM is stored into this array
-    ctypes.POINTER(ctypes.c_int), #imag_data Imag data from RAM is stored into this array
-)
-spinapi.pb_get_data.restype = (ctypes.c_int)
-
-spinapi.pb_get_data_direct.argtype = (ctypes.c_int, ctypes.POINTER(ctypes.c_short))
-spinapi.pb_get_data_direct.restype = (ctypes.c_int)
-
-spinapi.pb_unset_radio_control.argtype = (ctypes.c_int)
-spinapi.pb_unset_radio_control.restype = (ctypes.c_int)
-
-spinapi.pb_inst_pbonly.argtype = (
-    ctypes.c_int, #flags
-	ctypes.c_int, #inst
-	ctypes.c_int, #inst data
-	ctypes.c_double, #length (double)
-)
-spinapi.pb_inst_pbonly.restype = (ctypes.c_int)
-
-spinapi.pb_dds_load.argtype = (ctypes.c_float, ctypes.c_int)
-spinapi.pb_dds_load.restype = (ctypes.c_int)
-
-spinapi.pb_inst_radio.argtype = (
-    ctypes.c_int, #Frequency register 
-	ctypes.c_int, #Cosine phase
-	ctypes.c_int, #Sin phase
-	ctypes.c_int, #tx phase
-	ctypes.c_int, #tx enable
-	ctypes.c_int, #phase reset
-	ctypes.c_int, #trigger scan
-	ctypes.c_int, #flags
-	ctypes.c_int, #inst
-	ctypes.c_int, #inst data
-	ctypes.c_double, #length (double)
-)
-spinapi.pb_inst_radio.restype = (ctypes.c_int)
-
-spinapi.pb_inst_radio_shape.argtype = (
-    ctypes.c_int, #Frequency register
-    ctypes.c_int, #cos phase
-    ctypes.c_int, #sin phase
- 	ctypes.c_int, #tx phase
- 	ctypes.c_int, #tx enable
- 	ctypes.c_int, #phase reset
-    ctypes.c_int, #trigger scan
-    ctypes.c_int, # useshape
-    ctypes.c_int, # amp
- 	ctypes.c_int, #flags
- 	ctypes.c_int, #inst
- 	ctypes.c_int, #inst data
- 	ctypes.c_double, #length (double)
- )
-spinapi.pb_inst_radio_shape.restype = (ctypes.c_int)
-
-spinapi.pb_inst_dds2.argtype = (
-	ctypes.c_int, #Frequency register DDS0
-	ctypes.c_int, #Phase register DDS0
-	ctypes.c_int, #Amplitude register DDS0
-	ctypes.c_int, #Output enable DDS0
-	ctypes.c_int, #Phase reset DDS0
-	ctypes.c_int, #Frequency register DDS1
-	ctypes.c_int, #Phase register DDS1
-	ctypes.c_int, #Amplitude register DDS1
-	ctypes.c_int, #Output enable DDS1,
-	ctypes.c_int, #Phase reset DDS1,
-	ctypes.c_int, #Flags
-	ctypes.c_int, #inst
-	ctypes.c_int, #inst data
-	ctypes.c_double, #timing value (double)
-)
-spinapi.pb_inst_dds2.restype = (ctypes.c_int)
-
-spinapi.pb_write_felix.argtype = (
-	ctypes.c_char_p, #fnameout The filename for the Felix file you want to create
-	ctypes.c_char_p, #title_string 	Large string with all parameter information to include in Felix Title Block
-	ctypes.c_int, #num_points Number of points to write to the file
-	ctypes.c_float, #SW Spectral width of the baseband data in Hz
-    ctypes.c_float, #SF Spectrometer frequency in MHz
-	ctypes.c_int, #real_data Integer array containing the real portion of the data points
-    ctypes.c_int, #imag_data Integer array containing the imaginary portion of the data points
-)
-spinapi.pb_write_felix.restype = (ctypes.c_int)
-
-spinapi.pb_setup_filters.argtype = (
-    ctypes.c_double, #spectral_width
-    ctypes.c_int, #scan_repetitions
-    ctypes.c_int, #cmd
-)
-spinapi.pb_setup_filters.restype = (ctypes.c_int)
-
-spinapi.pb_inst_radio_shape_cyclops.argtype = (
-    ctypes.c_int, #Frequency register
-    ctypes.c_int, #cos phase
-    ctypes.c_int, #sin phase
- 	ctypes.c_int, #tx phase
- 	ctypes.c_int, #tx enable
- 	ctypes.c_int, #phase reset
-    ctypes.c_int, #trigger scan
-    ctypes.c_int, #useshape
-    ctypes.c_int, #amp
-    ctypes.c_int, #real_add_sub
-    ctypes.c_int, #imag_add_sub
-    ctypes.c_int, #channel_swap
- 	ctypes.c_int, #flags
- 	ctypes.c_int, #inst
- 	ctypes.c_int, #inst data
- 	ctypes.c_double, #length (double)
- )
-spinapi.pb_inst_radio_shape_cyclops.restype = (ctypes.c_int)
-
-spinapi.pb_fft_find_resonance.argtypes = (
-    ctypes.c_int,                    # num_points: Number of complex data points
-    ctypes.c_double,                 # SF: Spectrometer Frequency used for the experiment (in Hz)
-    ctypes.c_double,                 # SW: Spectral Width used for data acquisition (in Hz)
-    ctypes.POINTER(ctypes.c_int),    # real: Array of the real part of the complex data points
-    ctypes.POINTER(ctypes.c_int)     # imag: Array of the imaginary part of the complex data points
-)
-spinapi.pb_fft_find_resonance.restype = ctypes.c_double
-
-spinapi.pb_write_ascii.argtype = (
-    ctypes.c_char_p,  # fname
-    ctypes.c_int,     # num_points
-    ctypes.c_float,   # SW
-    ctypes.POINTER(ctypes.c_int),  # real_data
-    ctypes.POINTER(ctypes.c_int)   # imag_data
-)
-spinapi.pb_write_ascii.restype = ctypes.c_int
-
-spinapi.pb_write_ascii_verbose.argtype = (
-    ctypes.c_char_p,  # fname
-    ctypes.c_int,     # num_points
-    ctypes.c_float,   # SW
-    ctypes.c_float,    # SF
-    ctypes.POINTER(ctypes.c_int),  # real_data
-    ctypes.POINTER(ctypes.c_int)   # imag_data
-)
-spinapi.pb_write_ascii_verbose.restype = ctypes.c_int
-
-spinapi.pb_write_jcamp.argtypes = (
-    ctypes.c_char_p,  # fname
-    ctypes.c_int,     # num_points
-    ctypes.c_float,   # SW
-    ctypes.c_float,   # SF
-    ctypes.POINTER(ctypes.c_int),  # real_data
-    ctypes.POINTER(ctypes.c_int)   # imag_data
-)
-spinapi.pb_write_jcamp.restype = ctypes.c_int
-
-spinapi.pb_set_scan_segments.argtype = (ctypes.c_int)
-spinapi.pb_set_scan_segments.restype = (ctypes.c_int)
-
+INT_P = ctypes.POINTER(ctypes.c_int)
+SHORT_P = ctypes.POINTER(ctypes.c_short)
+
+# restype and argtypes of every exported function (from spinapi.h); ctypes checks
+# and converts the arguments from these, so the wrappers pass Python values straight on
+PROTOTYPES = {
+	"pb_get_version": (ctypes.c_char_p, ()),
+	"pb_get_error": (ctypes.c_char_p, ()),
+	"pb_count_boards": (ctypes.c_int, ()),
+	"pb_init": (ctypes.c_int, ()),
+	"pb_select_board": (ctypes.c_int, (ctypes.c_int,)),
+	"pb_set_debug": (ctypes.c_int, (ctypes.c_int,)),
+	"pb_set_defaults": (ctypes.c_int, ()),
+	"pb_set_freq": (ctypes.c_int, (ctypes.c_double,)),
+	"pb_set_phase": (ctypes.c_int, (ctypes.c_double,)),
+	"pb_set_amp": (ctypes.c_int, (ctypes.c_float, ctypes.c_int)),  # amp, register
+	"pb_overflow": (ctypes.c_int, (ctypes.c_int, ctypes.c_void_p)),  # reset, PB_OVERFLOW_STRUCT*
+	"pb_scan_count": (ctypes.c_int, (ctypes.c_int,)),
+	"pb_set_num_points": (ctypes.c_int, (ctypes.c_int,)),
+	"pb_set_radio_control": (ctypes.c_int, (ctypes.c_uint,)),
+	"pb_unset_radio_control": (ctypes.c_int, (ctypes.c_uint,)),
+	"pb_core_clock": (None, (ctypes.c_double,)),  # MHz
+	"pb_write_register": (ctypes.c_int, (ctypes.c_uint, ctypes.c_uint)),
+	"pb_start_programming": (ctypes.c_int, (ctypes.c_int,)),
+	"pb_stop_programming": (ctypes.c_int, ()),
+	"pb_start": (ctypes.c_int, ()),
+	"pb_stop": (ctypes.c_int, ()),
+	"pb_reset": (ctypes.c_int, ()),
+	"pb_close": (ctypes.c_int, ()),
+	"pb_read_status": (ctypes.c_int, ()),
+	"pb_status_message": (ctypes.c_char_p, ()),
+	"pb_get_firmware_id": (ctypes.c_int, ()),
+	"pb_sleep_ms": (None, (ctypes.c_int,)),
+	# num_points, real_data, imag_data
+	"pb_get_data": (ctypes.c_int, (ctypes.c_int, INT_P, INT_P)),
+	"pb_get_data_direct": (ctypes.c_int, (ctypes.c_int, SHORT_P)),
+	"pb_dds_load": (ctypes.c_int, (ctypes.POINTER(ctypes.c_float), ctypes.c_int)),  # data, device
+	# flags, inst, inst data, length (ns)
+	"pb_inst_pbonly": (
+		ctypes.c_int, (ctypes.c_uint, ctypes.c_int, ctypes.c_int, ctypes.c_double),
+	),
+	# freq, cos phase, sin phase, tx phase, tx enable, phase reset, trigger scan,
+	# flags, inst, inst data, length
+	"pb_inst_radio": (ctypes.c_int, (ctypes.c_int,) * 10 + (ctypes.c_double,)),
+	# as pb_inst_radio with use shape and amp after trigger scan
+	"pb_inst_radio_shape": (ctypes.c_int, (ctypes.c_int,) * 12 + (ctypes.c_double,)),
+	# as pb_inst_radio_shape with real add/sub, imag add/sub and channel swap after amp
+	"pb_inst_radio_shape_cyclops": (ctypes.c_int, (ctypes.c_int,) * 15 + (ctypes.c_double,)),
+	# freq, phase, amp, output enable, phase reset for DDS0 then DDS1, flags, inst,
+	# inst data, length
+	"pb_inst_dds2": (ctypes.c_int, (ctypes.c_int,) * 13 + (ctypes.c_double,)),
+	# fnameout, title_string, num_points, SW (Hz), SF (MHz), real_data, imag_data
+	"pb_write_felix": (
+		ctypes.c_int,
+		(ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int, ctypes.c_float, ctypes.c_float,
+		 INT_P, INT_P),
+	),
+	# spectral_width, scan_repetitions, cmd
+	"pb_setup_filters": (ctypes.c_int, (ctypes.c_double, ctypes.c_int, ctypes.c_int)),
+	# num_points, SF (Hz), SW (Hz), real, imag
+	"pb_fft_find_resonance": (
+		ctypes.c_double, (ctypes.c_int, ctypes.c_double, ctypes.c_double, INT_P, INT_P),
+	),
+	# fname, num_points, SW, real_data, imag_data
+	"pb_write_ascii": (
+		ctypes.c_int, (ctypes.c_char_p, ctypes.c_int, ctypes.c_float, INT_P, INT_P),
+	),
+	# fname, num_points, SW, SF, real_data, imag_data
+	"pb_write_ascii_verbose": (
+		ctypes.c_int,
+		(ctypes.c_char_p, ctypes.c_int, ctypes.c_float, ctypes.c_float, INT_P, INT_P),
+	),
+	"pb_write_jcamp": (
+		ctypes.c_int,
+		(ctypes.c_char_p, ctypes.c_int, ctypes.c_float, ctypes.c_float, INT_P, INT_P),
+	),
+	"pb_set_scan_segments": (ctypes.c_int, (ctypes.c_int,)),
+}
+
+def _set_prototypes(dll):
+	for name, (restype, argtypes) in PROTOTYPES.items():
+		func = getattr(dll, name, None)
+		if func is None:  # older library versions lack some of the RadioProcessor calls
+			continue
+		func.restype = restype
+		func.argtypes = argtypes
+
+
+# Data buffers are NumPy arrays handed to the library by address: no per-element
+# copy through Python, and results land in the caller's array. numpy is imported
+# on first use so that importing this module stays cheap.
+
+def _out_buffer(data, num_points, ctype):
+	"""``data`` checked as a buffer the library can write ``num_points`` into, or a new one."""
+	import numpy as np  # noqa: PLC0415
+
+	dtype = np.dtype(np.int32 if ctype is ctypes.c_int else np.int16)
+	if data is None:
+		return np.zeros(num_points, dtype=dtype)
+	if (
+		not isinstance(data, np.ndarray) or data.dtype != dtype
+		or not data.flags.c_contiguous or not data.flags.writeable
+	):
+		raise TypeError(f"Expected a writable C-contiguous {dtype} array")
+	if data.size < num_points:
+		raise ValueError(f"Buffer holds {data.size} points, {num_points} requested")
+	return data
+
+def _pointer(array, pointer_type):
+	return array.ctypes.data_as(pointer_type)
+
+def _in_pointer(data, num_points):
+	"""Pointer to ``data`` as C ints: an np.int32 array as it is, anything else converted once."""
+	import numpy as np  # noqa: PLC0415
+
+	array = np.ascontiguousarray(data, dtype=np.int32)  # no copy if it already is one
+	if array.size < num_points:
+		raise ValueError(f"Data holds {array.size} points, {num_points} requested")
+	return _pointer(array, INT_P)  # data_as keeps a reference to the array
 
 def pb_get_version():
 	"""Return library version as UTF-8 encoded string."""
-	ret = spinapi.pb_get_version()
-	return str(ctypes.c_char_p(ret).value.decode("utf-8"))
+	return spinapi.pb_get_version().decode("utf-8")
 
 def pb_get_error():
 	"""Return library error as UTF-8 encoded string."""
-	ret = spinapi.pb_get_error()
-	return str(ctypes.c_char_p(ret).value.decode("utf-8"))
+	return spinapi.pb_get_error().decode("utf-8")
 	
 def pb_count_boards():
 	"""Return the number of boards detected in the system."""
@@ -381,41 +311,29 @@ def pb_set_defaults():
 	"""Set board defaults. Must be called before using any other board functions."""
 	return spinapi.pb_set_defaults()
 
-def pb_set_freq(*args):
-    t = list(args)
-    #Argument 0 must be a double
-    t[0] = ctypes.c_double(t[0])
-    args = tuple(t)
-    return spinapi.pb_set_freq(*args)
-
-def pb_set_phase(*args):
-    t = list(args)
-    #Argument 0 must be a double
-    t[0] = ctypes.c_double(t[0])
-    args = tuple(t)
-    return spinapi.pb_set_phase(*args)
-
-def pb_set_amp(*args):
-    t = list(args)
-    #Argument 0 must be a float
-    t[0] = ctypes.c_float(t[0])
-    args = tuple(t)
-    return spinapi.pb_set_amp(*args)
-
-def pb_overflow(*args):
-	return spinapi.pb_overflow(*args)
-
-def pb_scan_count(*args):
-	return spinapi.pb_scan_count(*args)
-
-def pb_set_num_points(*args):
-	return spinapi.pb_set_num_points(*args)
-
-def pb_set_radio_control(*args):
-	return spinapi.pb_set_radio_control(*args)
+def pb_set_freq(freq):
+	return spinapi.pb_set_freq(freq)
+
+def pb_set_phase(phase):
+	return spinapi.pb_set_phase(phase)
+
+def pb_set_amp(amp, addr):
+	return spinapi.pb_set_amp(amp, addr)
+
+def pb_overflow(reset, of=None):
+	return spinapi.pb_overflow(reset, of)
+
+def pb_scan_count(reset):
+	return spinapi.pb_scan_count(reset)
+
+def pb_set_num_points(num_points):
+	return spinapi.pb_set_num_points(num_points)
+
+def pb_set_radio_control(control):
+	return spinapi.pb_set_radio_control(control)
 	
 def pb_core_clock(clock):
-	return spinapi.pb_core_clock(ctypes.c_double(clock))
+	return spinapi.pb_core_clock(clock)
 	
 def pb_write_register(address, value):
 	return spinapi.pb_write_register(address, value)
@@ -426,46 +344,50 @@ def pb_start_programming(target):
 def pb_stop_programming():
 	return spinapi.pb_stop_programming()
 
-def pb_dds_load(*args):
-    t = list(args)
-    #List of argument 0 must be floats
-    t[0] = (ctypes.c_float * len(t[0]))(*t[0])
-    args = tuple(t)
-    return spinapi.pb_dds_load(*args)
-
-def pb_inst_pbonly(*args):
-    t = list(args)
-    #Argument 3 must be a double
-    t[3] = ctypes.c_double(t[3])
-    args = tuple(t)
-    return spinapi.pb_inst_pbonly(*args)
-
-def pb_inst_radio(*args):
-    t = list(args)
-    #Argument 10 must be a double
-    t[10] = ctypes.c_double(t[10])
-    args = tuple(t)
-    return spinapi.pb_inst_radio(*args)
+def pb_dds_load(data, device):
+	return spinapi.pb_dds_load((ctypes.c_float * len(data))(*data), device)
+
+def pb_inst_pbonly(flags, inst, inst_data, length):
+	return _raw.pb_inst_pbonly(flags, inst, inst_data, ctypes.c_double(length))
+
+def pb_inst_radio(
+	freq, cos_phase, sin_phase, tx_phase, tx_enable, phase_reset, trigger_scan, flags, inst,
+	inst_data, length,
+):
+	return _raw.pb_inst_radio(
+		freq, cos_phase, sin_phase, tx_phase, tx_enable, phase_reset, trigger_scan, flags, inst,
+		inst_data, ctypes.c_double(length),
+	)
 
 def pb_inst_dds(FREQ, TX_PHASE, TX_ENABLE, PHASE_RESET, FLAGS, INST, INST_DATA, LENGTH):
-	return pb_inst_radio(FREQ, 0, 0, TX_PHASE, TX_ENABLE, PHASE_RESET, 0, FLAGS, INST, INST_DATA, LENGTH)
-
-def pb_inst_radio_shape(*args):
-    t = list(args)
-    # Argument 12 must be a double
-    t[12] = ctypes.c_double(t[12])
-    args = tuple(t)
-    return spinapi.pb_inst_radio_shape(*args)
+	return _raw.pb_inst_radio(
+		FREQ, 0, 0, TX_PHASE, TX_ENABLE, PHASE_RESET, 0, FLAGS, INST, INST_DATA,
+		ctypes.c_double(LENGTH),
+	)
+
+def pb_inst_radio_shape(
+	freq, cos_phase, sin_phase, tx_phase, tx_enable, phase_reset, trigger_scan, use_shape, amp,
+	flags, inst, inst_data, length,
+):
+	return _raw.pb_inst_radio_shape(
+		freq, cos_phase, sin_phase, tx_phase, tx_enable, phase_reset, trigger_scan, use_shape,
+		amp, flags, inst, inst_data, ctypes.c_double(length),
+	)
         
 def pb_inst_dds_shape(FREQ, TX_PHASE, TX_ENABLE, PHASE_RESET, USESHAPE, AMP, FLAGS, INST, INST_DATA, LENGTH):
-	return pb_inst_radio_shape(FREQ, 0, 0, TX_PHASE, TX_ENABLE, PHASE_RESET, 0, USESHAPE, AMP, FLAGS, INST, INST_DATA, LENGTH);
-
-def pb_inst_dds2(*args):
-	t = list(args)
-	#Argument 13 must be a double
-	t[13] = ctypes.c_double(t[13])
-	args = tuple(t)
-	return spinapi.pb_inst_dds2(*args)
+	return _raw.pb_inst_radio_shape(
+		FREQ, 0, 0, TX_PHASE, TX_ENABLE, PHASE_RESET, 0, USESHAPE, AMP, FLAGS, INST, INST_DATA,
+		ctypes.c_double(LENGTH),
+	)
+
+def pb_inst_dds2(
+	freq0, phase0, amp0, dds_en0, phase_reset0, freq1, phase1, amp1, dds_en1, phase_reset1,
+	flags, inst, inst_data, length,
+):
+	return _raw.pb_inst_dds2(
+		freq0, phase0, amp0, dds_en0, phase_reset0, freq1, phase1, amp1, dds_en1, phase_reset1,
+		flags, inst, inst_data, ctypes.c_double(length),
+	)
 
 def pb_start():
 	return spinapi.pb_start()
@@ -483,9 +405,8 @@ def pb_read_status():
     return spinapi.pb_read_status()
 
 def pb_status_message():
-    """Return library version as UTF-8 encoded string."""
-    ret = spinapi.pb_status_message()
-    return str(ctypes.c_char_p(ret).value.decode("utf-8"))
+    """Return the board status as UTF-8 encoded string."""
+    return spinapi.pb_status_message().decode("utf-8")
 
 def pb_get_firmware_id():
     return spinapi.pb_get_firmware_id()
@@ -493,126 +414,69 @@ def pb_get_firmware_id():
 def pb_sleep_ms(mlsc):
     return spinapi.pb_sleep_ms(mlsc)
 
-def pb_get_data(num_points, real_data, imag_data):
-    # Create arrays to store the data
-    c_real_data = (ctypes.c_int * num_points)(*real_data)
-    c_imag_data = (ctypes.c_int * num_points)(*imag_data)
-
-    # Assign the memory address of the c_real_data and c_imag_data arrays to the pointer arguments
-    real_data_pointer = ctypes.cast(c_real_data, ctypes.POINTER(ctypes.c_int))
-    imag_data_pointer = ctypes.cast(c_imag_data, ctypes.POINTER(ctypes.c_int))
-
-    real_data.contents = real_data_pointer
-    imag_data.contents = imag_data_pointer
-
-    # Call the C function with the updated data pointers
-    result = spinapi.pb_get_data(num_points, real_data, imag_data)
+def pb_get_data(num_points, real_data=None, imag_data=None):
+    """Read ``num_points`` complex points; returns (result, real_data, imag_data) as np.int32 arrays.
 
-    return result
+    The library writes straight into ``real_data``/``imag_data`` when they are
+    given (writable, C-contiguous np.int32 of at least ``num_points``), else
+    into new arrays.
+    """
+    real_data = _out_buffer(real_data, num_points, ctypes.c_int)
+    imag_data = _out_buffer(imag_data, num_points, ctypes.c_int)
+    result = spinapi.pb_get_data(num_points, _pointer(real_data, INT_P), _pointer(imag_data, INT_P))
+    return result, real_data, imag_data
 
 
-def pb_get_data_direct(num_points, data):
-    # Create a C-style array of shorts using ctypes
-    c_data = (ctypes.c_short * num_points)(*data)
-
-    # Assign the memory address of the c_data array to the pointer argument
-    data_pointer = ctypes.cast(c_data, ctypes.POINTER(ctypes.c_short))
-    data.contents = data_pointer
-
-    # Call the C function with the updated data pointer
-    result = spinapi.pb_get_data_direct(num_points, data)
-
-    return result
+def pb_get_data_direct(num_points, data=None):
+    """Read ``num_points`` raw samples; returns (result, data) with data as np.int16, filled in place."""
+    data = _out_buffer(data, num_points, ctypes.c_short)
+    result = spinapi.pb_get_data_direct(num_points, _pointer(data, SHORT_P))
+    return result, data
 
 def pb_unset_radio_control(ctrl):
     return spinapi.pb_unset_radio_control(ctrl)
 
-def pb_write_felix(*args):
-    t = list(args)
-    t[0] = ctypes.c_char_p(t[0].encode())
-    t[1] = ctypes.c_char_p(t[1].encode())
-    #Argument 3 must be a float
-    t[3] = ctypes.c_float(t[3])
-    #Argument 4 must be a float
-    t[4] = ctypes.c_float(t[4])
-    #List of argument 5 must be integers
-    t[5] = (ctypes.c_int * len(t[5]))(*t[5])
-    #List of argument 6 must be integers
-    t[6] = (ctypes.c_int * len(t[6]))(*t[6])
-    args = tuple(t)
-    return spinapi.pb_write_felix(*args)
-
-def pb_setup_filters(*args):
-    t = list(args)
-    # Argument 0 must be a double
-    t[0] = ctypes.c_double(t[0])
-    args = tuple(t)
-    return spinapi.pb_setup_filters(*args)
-
-def pb_inst_radio_shape_cyclops(*args):
-    t = list(args)
-    # Argument 15 must be a double
-    t[15] = ctypes.c_double(t[15])
-    args = tuple(t)
-    return spinapi.pb_inst_radio_shape_cyclops(*args)
+def pb_write_felix(fnameout, title_string, num_points, SW, SF, real_data, imag_data):
+    return spinapi.pb_write_felix(
+        fnameout.encode(), title_string.encode(), num_points, SW, SF,
+        _in_pointer(real_data, num_points), _in_pointer(imag_data, num_points),
+    )
+
+def pb_setup_filters(spectral_width, scan_repetitions, cmd):
+    return spinapi.pb_setup_filters(spectral_width, scan_repetitions, cmd)
+
+def pb_inst_radio_shape_cyclops(
+    freq, cos_phase, sin_phase, tx_phase, tx_enable, phase_reset, trigger_scan, use_shape, amp,
+    real_add_sub, imag_add_sub, channel_swap, flags, inst, inst_data, length,
+):
+    return _raw.pb_inst_radio_shape_cyclops(
+        freq, cos_phase, sin_phase, tx_phase, tx_enable, phase_reset, trigger_scan, use_shape,
+        amp, real_add_sub, imag_add_sub, channel_swap, flags, inst, inst_data,
+        ctypes.c_double(length),
+    )
 
 def pb_fft_find_resonance(num_points, SF, SW, real_data, imag_data):
-    # Create a C-style array of ints using ctypes
-    c_real_data = (ctypes.c_int * num_points)(*real_data)
-    c_imag_data = (ctypes.c_int * num_points)(*imag_data)
-
-    # Assign the memory address of the c_data arrays to the pointer arguments
-    real_data_pointer = ctypes.cast(c_real_data, ctypes.POINTER(ctypes.c_int))
-    imag_data_pointer = ctypes.cast(c_imag_data, ctypes.POINTER(ctypes.c_int))
-
-    # Call the C function with the updated data pointers
-    result = spinapi.pb_fft_find_resonance(num_points, SF, SW, real_data_pointer, imag_data_pointer)
-    
-    return result
+    return spinapi.pb_fft_find_resonance(
+        num_points, SF, SW, _in_pointer(real_data, num_points), _in_pointer(imag_data, num_points),
+    )
 
 def pb_write_ascii(fname, num_points, SW, real_data, imag_data):
-    # Convert the file name to a C-style string
-    c_fname = ctypes.c_char_p(fname.encode())
-
-    # Convert the Python lists to C-style arrays
-    c_real_data = (ctypes.c_int * num_points)(*real_data)
-    c_imag_data = (ctypes.c_int * num_points)(*imag_data)
-
-    # Call the C function
-    result = spinapi.pb_write_ascii(c_fname, num_points, SW, c_real_data, c_imag_data)
-
-    return result
+    return spinapi.pb_write_ascii(
+        fname.encode(), num_points, SW,
+        _in_pointer(real_data, num_points), _in_pointer(imag_data, num_points),
+    )
 
 def pb_write_ascii_verbose(fname, num_points, SW, SF, real_data, imag_data):
-    # Convert the file name to a C-style string
-    c_fname = ctypes.c_char_p(fname.encode())
-
-    # Convert the Python lists to C-style arrays
-    c_real_data = (ctypes.c_int * num_points)(*real_data)
-    c_imag_data = (ctypes.c_int * num_points)(*imag_data)
-
-    # Call the C function
-    SW = ctypes.c_float(SW)
-    SF = ctypes.c_float(SF)
-    result = spinapi.pb_write_ascii_verbose(c_fname, num_points, SW, SF, c_real_data, c_imag_data)
-
-    return result
+    return spinapi.pb_write_ascii_verbose(
+        fname.encode(), num_points, SW, SF,
+        _in_pointer(real_data, num_points), _in_pointer(imag_data, num_points),
+    )
 
 def pb_write_jcamp(fname, num_points, SW, SF, real_data, imag_data):
-    # Convert the file name to a C-style string
-    c_fname = ctypes.c_char_p(fname.encode())
-
-    # Convert the Python lists to C-style arrays
-    c_real_data = (ctypes.c_int * num_points)(*real_data)
-    c_imag_data = (ctypes.c_int * num_points)(*imag_data)
-
-    SF = ctypes.c_float(SF)
-    SW = ctypes.c_float(SW)
-    
-    # Call the C function
-    result = spinapi.pb_write_jcamp(c_fname, num_points, SW, SF, c_real_data, c_imag_data)
-
-    return result
+    return spinapi.pb_write_jcamp(
+        fname.encode(), num_points, SW, SF,
+        _in_pointer(real_data, num_points), _in_pointer(imag_data, num_points),
+    )
 
 def pb_set_scan_segments(num_segments):
     # Call the C function
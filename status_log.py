@@ -0,0 +1,48 @@
+import logging
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from constants import LOG_BACKUPS, LOG_BYTES, LOG_FILE, LOG_LINES
+
+
+class StatusLog:
+    """Bounded in-memory log of status messages.
+
+    The last ``maxlen`` records are kept in a ring buffer; each one that falls
+    out is written to a rotating file, so adding a message costs the same no
+    matter how long the app has been running. ``close`` writes out the rest.
+    """
+
+    def __init__(
+        self, path=None, maxlen=LOG_LINES, max_bytes=LOG_BYTES, backups=LOG_BACKUPS,
+    ) -> None:
+        self.records = deque(maxlen=maxlen)  # (time.time(), text)
+        self.path = Path(path) if path is not None else Path(__file__).parent / LOG_FILE
+
+        self.logger = logging.getLogger(f"{__name__}.{id(self)}")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        # delay=True: no file is created until something is actually written
+        self.handler = RotatingFileHandler(
+            self.path, maxBytes=max_bytes, backupCount=backups, delay=True,
+        )
+        self.handler.setFormatter(logging.Formatter("%(message)s"))
+        self.logger.addHandler(self.handler)
+
+    def add(self, text: str) -> None:
+        if len(self.records) == self.records.maxlen:
+            self._write(self.records[0])
+        self.records.append((time.time(), text))
+
+    def _write(self, record) -> None:
+        stamp, text = record
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stamp))
+        self.logger.info("%s %s", when, text)
+
+    def close(self) -> None:
+        while self.records:
+            self._write(self.records.popleft())
+        self.handler.close()
+        self.logger.removeHandler(self.handler)
@@ -0,0 +1,57 @@
+"""VironClient against an in-memory laser: python -m pytest test_vironAPI.py (or run it directly)."""
+
+import asyncio
+
+from vironAPI import STATUS_QUERIES, WINDOW, VironClient
+
+
+class FakeLaser:
+    """Writer end the client talks to; replies only when ``answer`` is called, in order."""
+
+    def __init__(self) -> None:
+        self.reader = asyncio.StreamReader()
+        self.written = []  # (time, command)
+
+    def write(self, command: str) -> None:
+        self.written.append((asyncio.get_running_loop().time(), command.strip()))
+
+    async def drain(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.reader.feed_eof()
+
+    def answer(self, line: str) -> None:
+        self.reader.feed_data(f"{line}\r".encode("ascii"))
+
+
+async def stop_with_full_window() -> None:
+    laser = FakeLaser()
+    client = VironClient(laser.reader, laser)
+    polls = [client.submit(f"${key} ?") for key, _ in STATUS_QUERIES.values()]
+    assert len(polls) >= WINDOW
+    await asyncio.sleep(0.01)  # the writer fills the window; the laser doesn't answer yet
+    assert len(laser.written) == WINDOW
+
+    sent = asyncio.get_running_loop().time()
+    stop = asyncio.ensure_future(client.send_receive("$STOP"))
+    await asyncio.sleep(0)
+    when, command = laser.written[-1]
+    assert command == "$STOP", laser.written
+    assert when - sent < 0.01
+
+    for key, _ in STATUS_QUERIES.values():  # the laser catches up, in order
+        laser.answer(f"${key} 1")
+    laser.answer("$STOP OK")
+    assert await stop == "$STOP OK"
+    assert [p.result() for p in polls] == [f"${key} 1" for key, _ in STATUS_QUERIES.values()]
+    client.close()
+
+
+def test_stop_goes_out_with_the_window_full() -> None:
+    asyncio.run(stop_with_full_window())
+
+
+if __name__ == "__main__":
+    test_stop_goes_out_with_the_window_full()
+    print("ok")
@@ -0,0 +1,50 @@
+"""Map the laser timings onto DG645 channels, linked so they move together.
+
+Only the CNI flashlamp channel A is referenced to T0. The Viron flashlamp
+channel B hangs off A, and each Q-switch channel off its laser's flashlamp
+channel with the FL -> QS spacing as its delay. Moving the overall timing is
+then a single ``DLAY`` on A and the DG645 carries everything else along in
+hardware; retiming one Q-switch only touches that laser's channel.
+"""
+
+FL_CHANNELS = {"c": "A", "v": "B"}  # flashlamp output per laser family
+QS_CHANNELS = {"c1": "C", "c2": "D", "c3": "E", "c4": "F", "v1": "G", "v2": "H"}  # c5 isn't wired
+
+
+def channel_delays(t0: float, cni_diode: float, viron_diode: float, qs: dict) -> dict:
+    """``{channel: (reference, delay)}`` for the DG645, all times in ns.
+
+    ``t0`` is the overall timing, the diodes are each family's flashlamp
+    timing relative to it, and ``qs`` maps a laser to its Q-switch timing
+    relative to ``t0`` as well.
+    """
+    diodes = {"c": cni_diode, "v": viron_diode}
+    delays = {
+        "A": ("T0", t0 + cni_diode),
+        "B": ("A", viron_diode - cni_diode),
+    }
+    for laser, value in qs.items():
+        if laser in QS_CHANNELS:
+            family = laser[0]
+            delays[QS_CHANNELS[laser]] = (FL_CHANNELS[family], value - diodes[family])
+    return delays
+
+
+# channel -> the channel it is linked to, as channel_delays sets it up
+REFERENCES = {
+    channel: reference
+    for channel, (reference, _) in channel_delays(0, 0, 0, dict.fromkeys(QS_CHANNELS, 0)).items()
+}
+
+
+def absolute_delays(delays: dict) -> dict:
+    """Resolve ``{channel: (reference, delay)}`` to delays after T0."""
+    resolved = {"T0": 0.0}
+
+    def resolve(channel):
+        if channel not in resolved:
+            reference, delay = delays[channel]
+            resolved[channel] = resolve(reference) + delay
+        return resolved[channel]
+
+    return {channel: resolve(channel) for channel in delays}
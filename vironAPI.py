@@ -1,29 +1,166 @@
 import asyncio
+import itertools
+import logging
+from collections import deque
+
 import telnetlib3
 
+TERMINATOR = b"\r"
+TIMEOUT = 3  # s to wait for a reply
+WINDOW = 4  # commands allowed on the wire ahead of their replies
+URGENT, NORMAL = 0, 1  # priorities: URGENT is written straight away, NORMAL is queued
+URGENT_COMMANDS = ("$STOP", "$STANDBY")
+ERROR_REPLY = "$ERR"  # keyword prefix of the laser's error replies
+# polled in the background; LaserState field -> (query keyword, type of the value)
+STATUS_QUERIES = {
+    "diode_temperature": ("DTEMF", float),
+    "laser_temperature": ("LTEMF", float),
+    "interlock": ("ILOCK", bool),
+    "shots": ("SSHOT", int),
+}
+
+log = logging.getLogger(__name__)
+
+
+class LaserError(OSError):
+    """The laser answered a command with an error reply."""
+
+
 def login_command(MAC):
     return f"$LOGIN VR{MAC.replace(':', '')[-6:]}\n"
 
 
-async def send_receive(reader, writer, command) -> str:
-    try:
-        async with asyncio.timeout(3):
-            writer.write(command)
-            await writer.drain()
-            resp = await reader.read(20)
-            return resp
-    except asyncio.TimeoutError:
-    # except IndexError:
-        return "Could not connect to the laser"
+def keyword(line: str) -> str:
+    return line.split(" ")[0].strip()
+
+
+def parse_value(reply: str) -> float:
+    """Value out of a query reply such as ``$MAXCURR 200.0``."""
+    return float(reply.split(" ")[1])
+
+
+class VironClient:
+    """Line-framed telnet client for one Viron laser.
+
+    Commands go through a per-laser queue drained by a single writer task, and
+    a single reader task hands each reply line to the oldest command still
+    waiting (FIFO). Up to ``WINDOW`` commands can be on the wire at once, so
+    polls pipeline. ``$STOP``/``$STANDBY`` skip both the queue and the window
+    and are written at once, even while the window is full of polls waiting
+    on a laser that has stopped answering.
 
+    Replies are read up to the ``\\r`` terminator and checked against their
+    command's keyword (``$MAXCURR ?`` -> ``$MAXCURR 200.0``). An error reply
+    (``$ERR...``) fails the oldest waiting command with ``LaserError``. Any other
+    line that answers a different command is a late reply to a request that
+    already timed out; it is logged and dropped, so it can't leak into the next
+    answer.
+    """
 
-async def create_reader_writer(host, port, mac):
-    try:
-        async with asyncio.timeout(3):
+    def __init__(self, reader, writer) -> None:
+        self.reader = reader
+        self.writer = writer
+        self._queue = asyncio.PriorityQueue()
+        self._in_flight = deque()
+        self._window = asyncio.Semaphore(WINDOW)
+        self._order = itertools.count()  # keeps FIFO order within a priority
+        self._error = None
+        self._tasks = [
+            asyncio.create_task(self._write_loop()),
+            asyncio.create_task(self._read_loop()),
+        ]
+
+    @classmethod
+    async def open(cls, host, port) -> "VironClient":
+        async with asyncio.timeout(TIMEOUT):
             reader, writer = await telnetlib3.open_connection(
                 host, port, encoding="ascii",
             )
-    except (ConnectionRefusedError, asyncio.TimeoutError):
-    # except IndexError:
-        return None, None, "Could not connect to the laser"
-    return reader, writer, "Initialized"
\ No newline at end of file
+        return cls(reader, writer)
+
+    def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._fail(ConnectionError("Connection closed"))
+        self.writer.close()
+
+    def submit(self, command: str, priority: int | None = None) -> asyncio.Future:
+        """Queue ``command`` and return a future for its reply line."""
+        if self._error is not None:
+            raise self._error
+        if not command.endswith("\n"):
+            command += "\n"
+        if priority is None:
+            priority = URGENT if keyword(command) in URGENT_COMMANDS else NORMAL
+        future = asyncio.get_running_loop().create_future()
+        if priority == URGENT:
+            # on the wire now; written and queued for its reply together, so FIFO order holds
+            self._in_flight.append((keyword(command), future))
+            self.writer.write(command)
+        else:
+            self._queue.put_nowait((priority, next(self._order), command, future))
+        return future
+
+    async def send_receive(self, command: str, timeout=TIMEOUT, priority=None) -> str:
+        # a timeout cancels the future, which frees its place on the wire
+        return await asyncio.wait_for(self.submit(command, priority), timeout)
+
+    async def pipeline(self, commands, timeout=TIMEOUT) -> list:
+        """Send all ``commands`` back to back, then collect their replies in order."""
+        futures = [self.submit(command) for command in commands]
+        return await asyncio.gather(*(asyncio.wait_for(f, timeout) for f in futures))
+
+    async def query(self, name: str, timeout=TIMEOUT) -> float:
+        return parse_value(await self.send_receive(f"${name} ?\n", timeout))
+
+    async def _write_loop(self) -> None:
+        while True:
+            # take a slot first, so the command picked is the best one queued by then
+            await self._window.acquire()
+            _, _, command, future = await self._queue.get()
+            if future.done():  # timed out while queued
+                self._window.release()
+                continue
+            future.add_done_callback(lambda _: self._window.release())
+            self._in_flight.append((keyword(command), future))
+            self.writer.write(command)
+            await self.writer.drain()
+
+    async def _read_loop(self) -> None:
+        try:
+            while True:
+                line = await self._readline()
+                while self._in_flight and self._in_flight[0][1].done():
+                    self._in_flight.popleft()  # gave up on this one already
+                if not self._in_flight:
+                    continue
+                key, future = self._in_flight[0]
+                if line.startswith("$") and keyword(line) != key:
+                    if keyword(line).startswith(ERROR_REPLY):
+                        self._in_flight.popleft()
+                        future.set_exception(LaserError(f"{key}: {line}"))
+                    else:
+                        log.warning("Dropped reply %r while waiting for %s", line, key)
+                    continue
+                self._in_flight.popleft()
+                future.set_result(line)
+        except (OSError, asyncio.IncompleteReadError) as e:
+            self._fail(ConnectionError(f"Connection to the laser lost ({e})"))
+
+    def _fail(self, error: Exception) -> None:
+        self._error = error
+        while self._in_flight:
+            _, future = self._in_flight.popleft()
+            if not future.done():
+                future.set_exception(error)
+        while not self._queue.empty():
+            _, _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(error)
+
+    async def _readline(self) -> str:
+        while True:
+            line = await self.reader.readuntil(TERMINATOR)
+            line = line.decode("ascii", errors="replace").strip("\r\n\x00 ")
+            if line:
+                return line